@@ -40,9 +40,11 @@ limitations under the License.
 
 class Error(namedtuple('Error', ['severity', 'message'])):
     """
-    An Error data with a severity and message.
+    An Error data with a severity and message. The optional kind is an
+    identifier of the message template of this error used to report the
+    errors of the same kind together. It is not compared.
     """
-    def __new__(self, severity, message):
+    def __new__(self, severity, message, kind=None):
         if message:
             if isinstance(message, str):
                 message = self._clean_string(message)
@@ -50,16 +52,30 @@ class Error(namedtuple('Error', ['severity', 'message'])):
                 message = self._clean_string(str(repr(message), encoding='utf-8'))
                 message = message.strip('"')
 
-        return super(Error, self).__new__(
+        error = super(Error, self).__new__(
             Error, severity, message)
+        error.kind = kind
+        return error
+
+    def __getnewargs__(self):
+        return tuple(self) + (self.kind,)
 
     def __repr__(self, *args, **kwargs):
         sev, msg = self._get_values()
         return 'Error(%(sev)s,  %(msg)s)' % locals()
 
     def __eq__(self, other):
+        if isinstance(other, Error):
+            # the messages are cleaned on creation: there is no need to
+            # compare their cleaned representation
+            return tuple.__eq__(self, other)
         return repr(self) == repr(other)
 
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
     def _get_values(self):
         sev = severities[self.severity]
         msg = self._clean_string(repr(self.message))
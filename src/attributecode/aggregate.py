@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import json
+import posixpath
+
+from packageurl import PackageURL
+
+"""
+Aggregate the file records of a ScanCode scan in one component record per
+package, directory or package URL. The license detections and the other list
+values of the files of a component are merged.
+"""
+
+# group the files by enclosing detected package, by directory prefix or by
+# their package_url field
+AGGREGATION_MODES = ('package', 'directory', 'package_url',)
+
+# the file record fields used to group the files
+AGGREGATION_FIELDS = ('path', 'type', 'packages', 'package_url',)
+
+# number of groups merged at once by a worker process
+MERGE_CHUNK_SIZE = 100
+
+
+def aggregate_records(records, mode, depth=1, min_license_score=None, processes=1):
+    """
+    Return a list of component records aggregating the ScanCode file
+    `records` iterable, grouped by `mode`, one of AGGREGATION_MODES. The
+    components are returned in the order of their first file.
+
+    With the "directory" mode, the files are grouped by their directory path
+    prefix of `depth` segments.
+
+    If `min_license_score` is provided, only the license detections with this
+    score or more are merged and the components without such detections are
+    not returned. The files are grouped before filtering their detections
+    such that the package manifests without detections still define their
+    package. If `min_license_score` is None, all the components are returned.
+
+    If `processes` is more than one, the groups are merged by chunks in a pool
+    of this number of processes.
+    """
+    groups = group_records(records, mode, depth)
+    if processes > 1:
+        chunks = [groups[i:i + MERGE_CHUNK_SIZE] for i in range(0, len(groups), MERGE_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            merged_chunks = executor.map(_merge_groups, chunks, [min_license_score] * len(chunks))
+            components = [component for chunk in merged_chunks for component in chunk]
+    else:
+        components = _merge_groups(groups, min_license_score)
+    return [component for component in components if component is not None]
+
+
+def _merge_groups(groups, min_license_score):
+    """
+    Return a list of merged records or None for a `groups` list of (component
+    fields, records) tuples. This runs in a worker process.
+    """
+    return [merge_records(component, records, min_license_score) for component, records in groups]
+
+
+def group_records(records, mode, depth=1):
+    """
+    Return a list of (component fields mapping, list of file records) tuples
+    for the file `records` grouped by `mode`. The directory records are
+    skipped. A file that does not belong to any package is its own group.
+    """
+    if mode not in AGGREGATION_MODES:
+        raise ValueError('Unknown aggregation mode: {}'.format(mode))
+
+    records = [record for record in records if record.get('type') != 'directory']
+    if mode == 'package':
+        package_roots = get_package_roots(records)
+
+    # {group path: (component fields, records)}
+    groups = OrderedDict()
+    for record in records:
+        path = record.get('path') or ''
+        if mode == 'directory':
+            component = get_directory_component(path, depth)
+        elif mode == 'package':
+            component = get_enclosing_package(path, package_roots)
+        else:
+            component = get_package_url_component(record)
+        if component is None:
+            component = get_file_component(record)
+
+        group = groups.get(component['path'])
+        if group is None:
+            group = groups[component['path']] = (component, [])
+        group[1].append(record)
+    return list(groups.values())
+
+
+def get_file_component(record):
+    """
+    Return the component fields of a file `record` that is not aggregated.
+    """
+    path = record.get('path') or ''
+    return OrderedDict([
+        ('path', path),
+        ('type', 'file'),
+        ('name', record.get('name') or posixpath.basename(path)),
+    ])
+
+
+def get_directory_component(path, depth):
+    """
+    Return the component fields of the directory prefix of `depth` segments
+    of a file `path` or None for a file at the root.
+    """
+    segments = path.strip('/').split('/')[:-1]
+    if not segments:
+        return None
+    directory = '/'.join(segments[:depth])
+    return OrderedDict([
+        ('path', directory),
+        ('type', 'directory'),
+        ('name', posixpath.basename(directory)),
+    ])
+
+
+def get_package_roots(records):
+    """
+    Return a mapping of {root directory: package component fields} for the
+    packages detected in the file `records`. The root directory of a package
+    is the directory of its manifest file.
+    """
+    package_roots = {}
+    for record in records:
+        for package in record.get('packages') or []:
+            root = posixpath.dirname((record.get('path') or '').strip('/'))
+            if root not in package_roots:
+                package_roots[root] = get_package_component(root, package)
+    return package_roots
+
+
+def get_enclosing_package(path, package_roots):
+    """
+    Return the component fields of the innermost package of `package_roots`
+    that contains the file `path` or None.
+    """
+    directory = posixpath.dirname(path.strip('/'))
+    while True:
+        package = package_roots.get(directory)
+        if package is not None:
+            return package
+        if not directory:
+            return None
+        directory = posixpath.dirname(directory)
+
+
+def get_package_component(root, package):
+    """
+    Return the component fields of a ScanCode `package` mapping found in the
+    `root` directory.
+    """
+    purl = package.get('purl')
+    if not purl and package.get('type') and package.get('name'):
+        purl = PackageURL(
+            type=package.get('type'),
+            namespace=package.get('namespace'),
+            name=package.get('name'),
+            version=package.get('version'),
+            qualifiers=package.get('qualifiers'),
+            subpath=package.get('subpath'),
+        ).to_string()
+    return OrderedDict([
+        ('path', root),
+        ('type', 'package'),
+        ('name', package.get('name') or posixpath.basename(root)),
+        ('version', package.get('version') or ''),
+        ('package_url', purl or ''),
+    ])
+
+
+def get_package_url_component(record):
+    """
+    Return the component fields for the package URL of a file `record`: its
+    "package_url" field or the package URL of its first detected package, or
+    None.
+    """
+    purl = record.get('package_url')
+    if not purl:
+        for package in record.get('packages') or []:
+            purl = get_package_component('', package)['package_url']
+            if purl:
+                break
+    if not purl:
+        return None
+
+    try:
+        package_url = PackageURL.from_string(purl)
+        name = package_url.name
+        version = package_url.version or ''
+    except ValueError:
+        name = purl
+        version = ''
+    return OrderedDict([
+        ('path', purl),
+        ('type', 'package'),
+        ('name', name),
+        ('version', version),
+        ('package_url', purl),
+    ])
+
+
+def merge_records(component, records, min_license_score=None):
+    """
+    Return a new record for the `component` fields mapping merging the file
+    `records`, or None if there is no license detection with a score of
+    `min_license_score` or more.
+
+    The license detections are merged keeping the highest score of each
+    license and matched rule. The other list values are merged without
+    duplicates and the other values of the files are not kept.
+    """
+    merged = OrderedDict(component)
+    licenses = merge_license_detections(records, min_license_score)
+    if min_license_score is not None and not licenses:
+        return None
+    merged['licenses'] = licenses
+
+    # {field name: {value key: value}}
+    list_values = OrderedDict()
+    for record in records:
+        for name, values in record.items():
+            if name in merged or not isinstance(values, list):
+                continue
+            unique_values = list_values.setdefault(name, OrderedDict())
+            for value in values:
+                unique_values.setdefault(get_value_key(value), value)
+
+    for name, unique_values in list_values.items():
+        merged[name] = list(unique_values.values())
+    merged['files_count'] = len(records)
+    return merged
+
+
+def merge_license_detections(records, min_license_score=None):
+    """
+    Return a list of the license detections of the file `records`, keeping
+    the detection with the highest score of each license key and matched
+    rule and only the detections with a score of `min_license_score` or more.
+    """
+    # {(license key, matched license expression): detection}
+    detections = OrderedDict()
+    for record in records:
+        for detection in record.get('licenses') or []:
+            score = detection.get('score') or 0
+            if min_license_score is not None and score < min_license_score:
+                continue
+            matched_rule = detection.get('matched_rule') or {}
+            key = detection.get('key'), matched_rule.get('license_expression')
+            existing = detections.get(key)
+            if existing is None or (existing.get('score') or 0) < score:
+                detections[key] = detection
+    return list(detections.values())
+
+
+def get_value_key(value):
+    """
+    Return a hashable key to detect the duplicates of a list item `value`.
+    """
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
@@ -18,23 +18,36 @@ import json
 
 from urllib.parse import quote
 from urllib.parse import urlencode
-from urllib.request import Request
-from urllib.request import urlopen
 from urllib.error import HTTPError
 
 from attributecode import ERROR
 from attributecode import Error
+from attributecode import httpclient
 
 """
 API call helpers
 """
 
 
+NETWORK_ERROR = Error(ERROR, u'Network problem. Please check your Internet connection. '
+                             u'License fetching is skipped.', kind='network-error')
+
+AUTH_ERROR = Error(ERROR, u"Authorization denied. Invalid '--api_key'. "
+                          u"License generation is skipped.", kind='unauthorized-api-key')
+
+INVALID_URL_ERROR = Error(ERROR, u"URL not reachable. Invalid 'url'. "
+                                 u"License generation is skipped.", kind='unreachable-api-url')
+
+# the HTTP status codes of the licenses list endpoint for a wrong API URL
+INVALID_URL_STATUS_CODES = (404, 410,)
+
+
 # FIXME: args should start with license_key
-def request_license_data(api_url, api_key, license_key):
+def request_license_data(api_url, api_key, license_key, timeout=None):
     """
     Return a tuple of (dictionary of license data, list of errors) given a
     `license_key`. Send a request to `api_url` authenticating with `api_key`.
+    The request times out after `timeout` seconds if provided.
     """
     headers = {
         'Authorization': 'Token %s' % api_key,
@@ -55,30 +68,31 @@ def request_license_data(api_url, api_key, license_key):
     license_data = {}
     errors = []
     try:
-        request = Request(quoted_url, headers=headers)
-        response = urlopen(request)
+        response = httpclient.get(quoted_url, headers=headers, timeout=timeout)
         response_content = response.read().decode('utf-8')
         # FIXME: this should be an ordered dict
         license_data = json.loads(response_content)
         if not license_data['results']:
             msg = u"Invalid 'license': %s" % license_key
-            errors.append(Error(ERROR, msg))
+            errors.append(Error(ERROR, msg, kind='invalid-license-key'))
 
     except HTTPError as http_e:
         # some auth problem
         if http_e.code == 403:
-            msg = (u"Authorization denied. Invalid '--api_key'. "
-                   u"License generation is skipped.")
-            errors.append(Error(ERROR, msg))
+            errors.append(AUTH_ERROR)
         else:
             # Since no api_url/api_key/network status have
             # problem detected, it yields 'license' is the cause of
             # this exception.
             msg = u"Invalid 'license': %s" % license_key
-            errors.append(Error(ERROR, msg))
+            errors.append(Error(ERROR, msg, kind='invalid-license-key'))
+
+    except OSError:
+        # connection errors, timeouts and open circuit breaker
+        errors.append(NETWORK_ERROR)
 
     except Exception as e:
-        errors.append(Error(ERROR, str(e)))
+        errors.append(Error(ERROR, str(e), kind='license-fetch-failure'))
 
     finally:
         if license_data.get('count') == 1:
@@ -89,11 +103,89 @@ def request_license_data(api_url, api_key, license_key):
     return license_data, errors
 
 
-def get_license_details_from_api(api_url, api_key, license_key):
+def request_licenses_data(api_url, api_key, license_keys, timeout=None):
+    """
+    Return a tuple of (dictionary of {license key: license data}, list of
+    errors) given a `license_keys` list of license keys. Send as few requests
+    as possible to `api_url` authenticating with `api_key`: all the keys are
+    queried at once and the paginated results are iterated.
+    The requests time out after `timeout` seconds if provided.
+    """
+    headers = {
+        'Authorization': 'Token %s' % api_key,
+    }
+    payload = [
+        ('api_key', api_key),
+        ('format', 'json'),
+        ('page_size', len(license_keys)),
+    ]
+    payload.extend(('key', license_key) for license_key in license_keys)
+
+    api_url = api_url.rstrip('/')
+    payload = urlencode(payload)
+    next_url = '%(api_url)s/?%(payload)s' % locals()
+
+    licenses_data = {}
+    errors = []
+    try:
+        while next_url:
+            response = httpclient.get(next_url, headers=headers, timeout=timeout)
+            response_content = response.read().decode('utf-8')
+            page = json.loads(response_content)
+            for license_data in page.get('results') or []:
+                license_key = license_data.get('key')
+                if license_key in license_keys:
+                    licenses_data[license_key] = license_data
+            next_url = page.get('next')
+
+    except HTTPError as http_e:
+        # some auth problem
+        if http_e.code == 403:
+            errors.append(AUTH_ERROR)
+            return {}, errors
+        if http_e.code in INVALID_URL_STATUS_CODES:
+            # unknown keys are not an HTTP error but missing results: this
+            # is a wrong API URL
+            errors.append(INVALID_URL_ERROR)
+            return {}, errors
+        # a server error or rate limit only skips the licenses of this batch
+        msg = (u'Cannot fetch the licenses: %s. The following licenses are skipped: %s'
+               % (http_e, ', '.join(license_keys)))
+        errors.append(Error(ERROR, msg, kind='license-batch-fetch-failure'))
+        return {}, errors
+
+    except OSError:
+        # connection errors, timeouts and open circuit breaker
+        errors.append(NETWORK_ERROR)
+        return {}, errors
+
+    except Exception as e:
+        errors.append(Error(ERROR, str(e), kind='license-fetch-failure'))
+        return {}, errors
+
+    for license_key in license_keys:
+        if license_key not in licenses_data:
+            msg = u"Invalid 'license': %s" % license_key
+            errors.append(Error(ERROR, msg, kind='invalid-license-key'))
+
+    return licenses_data, errors
+
+
+def get_license_details_from_api(api_url, api_key, license_key, timeout=None):
     """
     Return license_data and errors where license_data is everything about the
     license from the DejaCode License Library and errors is a list of strings.
     Missing values are provided as empty strings.
     """
-    license_data, errors = request_license_data(api_url, api_key, license_key)
+    license_data, errors = request_license_data(api_url, api_key, license_key, timeout=timeout)
     return license_data, errors
+
+
+def get_licenses_details_from_api(api_url, api_key, license_keys, timeout=None):
+    """
+    Return a tuple of (dictionary of {license key: license data}, errors)
+    where license data is everything about each license from the DejaCode
+    License Library and errors is a list of Error.
+    """
+    licenses_data, errors = request_licenses_data(api_url, api_key, license_keys, timeout=timeout)
+    return licenses_data, errors
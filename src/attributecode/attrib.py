@@ -24,6 +24,8 @@ import io
 import os
 
 import jinja2
+from jinja2 import meta
+from jinja2 import nodes
 
 from attributecode import __version__
 from attributecode import CRITICAL
@@ -55,7 +57,8 @@ def generate(abouts, license_dict, min_license_score, template=None, variables=N
         lineno, message = template_error
         error = Error(
             CRITICAL,
-            'Template validation error at line: {lineno}: "{message}"'.format(**locals())
+            'Template validation error at line: {lineno}: "{message}"'.format(**locals()),
+            kind='template-validation-error',
         )
         return error, None
 
@@ -86,10 +89,12 @@ def generate(abouts, license_dict, min_license_score, template=None, variables=N
         error = Error(
             CRITICAL,
             'Template processing error {lineno}: {err}'.format(**locals()),
+            kind='template-processing-error',
         )
         error = Error(
             CRITICAL,
             'Template processing error:' + str(e),
+            kind='template-processing-error',
         )
 
     return error, rendered
@@ -106,6 +111,148 @@ def check_template(template_string):
         return e.lineno, e.message
 
 
+# the methods and filters that can access any field of an About object
+DYNAMIC_ACCESS_NAMES = frozenset(['items', 'keys', 'values', 'get', 'all_fields', 'custom_fields', 'fields'])
+DYNAMIC_ACCESS_FILTERS = frozenset(['dictsort', 'tojson', 'pprint', 'list', 'string', 'attr'])
+
+
+# the filters of About objects that return a value without their fields
+SCALAR_FILTERS = frozenset(['length', 'count'])
+
+
+def get_template_field_names(template_string):
+    """
+    Return a set of the field names a `template_string` can use: the names of
+    the attributes and the constant string items and arguments found in the
+    template. Return None if the template can access any field, for instance
+    with a variable item name of an About, by iterating over its fields or by
+    printing or passing a whole About to a call.
+    """
+    try:
+        template_ast = jinja2.Environment().parse(template_string)
+    except jinja2.TemplateSyntaxError:
+        return None
+
+    # the variables that are an About object or a list of About objects
+    about_names = get_about_names(template_ast)
+    if has_whole_about_access(template_ast, about_names):
+        return None
+
+    names = set()
+    for node in template_ast.find_all((nodes.Getattr, nodes.Getitem, nodes.Const, nodes.Filter)):
+        if isinstance(node, nodes.Getattr):
+            if node.attr in DYNAMIC_ACCESS_NAMES:
+                return None
+            names.add(node.attr)
+        elif isinstance(node, nodes.Getitem):
+            if (not isinstance(node.arg, nodes.Const)
+                    and isinstance(node.node, nodes.Name)
+                    and node.node.name in about_names):
+                return None
+        elif isinstance(node, nodes.Filter):
+            if node.name in DYNAMIC_ACCESS_FILTERS:
+                return None
+        elif isinstance(node.value, str):
+            # constant items and filter arguments such as multi_sort('name,version')
+            names.add(node.value)
+            names.update(name.strip() for name in node.value.split(','))
+    return names
+
+
+def get_about_names(template_ast):
+    """
+    Return a set of the variable names of a `template_ast` that are an About
+    object or a list of About objects: "abouts" and the variables assigned
+    or iterated from these, possibly through filters such as sort or groupby
+    and the "list" of a group.
+    """
+    about_names = set(['abouts'])
+    changed = True
+    while changed:
+        changed = False
+        for node in template_ast.find_all((nodes.For, nodes.Assign)):
+            source = node.iter if isinstance(node, nodes.For) else node.node
+            while (isinstance(source, nodes.Filter)
+                    or (isinstance(source, nodes.Getattr) and source.attr == 'list')):
+                source = source.node
+            if not (isinstance(source, nodes.Name) and source.name in about_names):
+                continue
+            for target in [node.target] + list(node.target.find_all(nodes.Name)):
+                if isinstance(target, nodes.Name) and target.name not in about_names:
+                    about_names.add(target.name)
+                    changed = True
+    return about_names
+
+
+def has_whole_about_access(template_ast, about_names):
+    """
+    Return True if a variable of `about_names` is used in a `template_ast`
+    other than to access one of its fields, iterate, assign or test it: for
+    instance printed or passed as a macro or call argument.
+    """
+    parents = {}
+    stack = [template_ast]
+    while stack:
+        node = stack.pop()
+        for child in node.iter_child_nodes():
+            parents[id(child)] = node
+            stack.append(child)
+
+    for name in template_ast.find_all(nodes.Name):
+        if name.ctx != 'load' or name.name not in about_names:
+            continue
+        expression = name
+        parent = parents.get(id(expression))
+        # the filters such as sort or first return About objects too
+        while isinstance(parent, nodes.Filter) and parent.node is expression:
+            if parent.name in SCALAR_FILTERS:
+                break
+            expression = parent
+            parent = parents.get(id(expression))
+        if isinstance(parent, nodes.Filter) and parent.node is expression:
+            continue
+        if isinstance(parent, (nodes.Getattr, nodes.Getitem, nodes.Assign, nodes.Test, nodes.Not)):
+            if parent.node is expression:
+                continue
+        if isinstance(parent, nodes.For) and parent.iter is expression:
+            continue
+        if isinstance(parent, (nodes.If, nodes.CondExpr)) and parent.test is expression:
+            continue
+        return True
+    return False
+
+
+def get_template_variable_names(template_string):
+    """
+    Return a set of the names of the variables passed to a `template_string`
+    that the template uses or None if the template is not valid.
+    """
+    try:
+        template_ast = jinja2.Environment().parse(template_string)
+    except jinja2.TemplateSyntaxError:
+        return None
+    return meta.find_undeclared_variables(template_ast)
+
+
+def uses_min_license_score(template_loc):
+    """
+    Return True if the template at `template_loc` uses the min_license_score
+    variable or cannot be analyzed.
+    """
+    with io.open(add_unc(template_loc), encoding='utf-8') as tplf:
+        names = get_template_variable_names(tplf.read())
+    return names is None or 'min_license_score' in names
+
+
+def get_template_field_names_from_file(template_loc):
+    """
+    Return a set of the field names the template at `template_loc` can use or
+    None.
+    """
+    with io.open(add_unc(template_loc), encoding='utf-8') as tplf:
+        return get_template_field_names(tplf.read())
+
+
 def generate_from_file(abouts, license_dict, min_license_score, template_loc=DEFAULT_TEMPLATE_FILE, variables=None):
     """
     Generate an attribution text from an `abouts` list of About objects, a
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from urllib.parse import quote
+
+from attributecode import Error
+
+"""
+Persistent on-disk cache for the license data fetched from the ScanCode
+LicenseDB or a DejaCode License Library.
+"""
+
+# one week, in seconds
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+
+# one day, in seconds
+DEFAULT_NEGATIVE_CACHE_TTL = 24 * 60 * 60
+
+# 100 MB
+DEFAULT_CACHE_MAX_SIZE = 100 * 1024 * 1024
+
+
+def get_default_cache_dir():
+    """
+    Return the default license cache directory. Use the
+    ATTRIBUTECODE_CACHE_DIR environment variable if set or an "attributecode"
+    directory in the user cache directory otherwise.
+    """
+    cache_dir = os.environ.get('ATTRIBUTECODE_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    user_cache_dir = os.environ.get('XDG_CACHE_HOME')
+    if not user_cache_dir:
+        user_cache_dir = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(user_cache_dir, 'attributecode')
+
+
+class LicenseCache(object):
+    """
+    A directory of cached license data keyed by source URL and license key.
+
+    Each entry is a JSON file stored under a sub-directory named after a hash
+    of the source URL. Entries older than `ttl` seconds are ignored and
+    removed. The license keys unknown to the source are also cached as
+    "missing" entries that expire after `negative_ttl` seconds. The least
+    recently used entries are evicted when the cache grows beyond `max_size`
+    bytes. Entries are written atomically such that several processes can
+    share the same cache directory.
+    """
+
+    def __init__(self, location, ttl=DEFAULT_CACHE_TTL, max_size=DEFAULT_CACHE_MAX_SIZE,
+                 negative_ttl=DEFAULT_NEGATIVE_CACHE_TTL):
+        self.location = location
+        self.ttl = ttl
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+
+    def __repr__(self):
+        location = self.location
+        return 'LicenseCache(location=%(location)r)' % locals()
+
+    def get_source_key(self, source_url, api_key=None):
+        """
+        Return the source key used to cache the license data fetched from
+        `source_url`. The data fetched from a DejaCode License Library depend
+        on the `api_key` used: a hash of this key is added such that two API
+        keys do not share their cache entries.
+        """
+        if not api_key:
+            return source_url
+        key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        return '%(source_url)s#api_key=%(key_hash)s' % locals()
+
+    def get_location(self, source_url, license_key):
+        """
+        Return the location of the cache entry file for a `license_key`
+        fetched from `source_url`.
+        """
+        url_hash = hashlib.sha1(source_url.encode('utf-8')).hexdigest()
+        file_name = quote(license_key, safe='') + '.json'
+        return os.path.join(self.location, url_hash, file_name)
+
+    def get(self, source_url, license_key):
+        """
+        Return the cached license data dictionary for a `license_key` fetched
+        from `source_url` or None if there is no fresh cache entry.
+        """
+        entry = self._read(source_url, license_key)
+        if entry and not entry.get('missing'):
+            return entry.get('data')
+
+    def get_missing(self, source_url, license_key):
+        """
+        Return a list of Error recorded for a `license_key` unknown to
+        `source_url` or None if this key is not cached as missing.
+        """
+        entry = self._read(source_url, license_key)
+        if entry and entry.get('missing'):
+            return [Error(*error) for error in entry.get('errors') or []]
+
+    def put(self, source_url, license_key, license_data):
+        """
+        Save the `license_data` dictionary for a `license_key` fetched from
+        `source_url` in the cache.
+        """
+        entry = dict(
+            url=source_url,
+            key=license_key,
+            timestamp=time.time(),
+            data=license_data,
+        )
+        self._write(self.get_location(source_url, license_key), entry)
+
+    def put_missing(self, source_url, license_key, errors):
+        """
+        Save a `license_key` unknown to `source_url` in the cache with the
+        `errors` list of Error reported for this key.
+        """
+        entry = dict(
+            url=source_url,
+            key=license_key,
+            timestamp=time.time(),
+            missing=True,
+            errors=[list(error) + [error.kind] for error in errors],
+        )
+        self._write(self.get_location(source_url, license_key), entry)
+
+    def is_expired(self, entry):
+        """
+        Return True if a cache `entry` mapping is older than the cache TTL or
+        the negative cache TTL for a missing entry.
+        """
+        ttl = self.negative_ttl if entry.get('missing') else self.ttl
+        timestamp = entry.get('timestamp') or 0
+        return time.time() - timestamp > ttl
+
+    def _read(self, source_url, license_key):
+        """
+        Return the fresh cache entry mapping for a `license_key` fetched from
+        `source_url` or None.
+        """
+        entry_location = self.get_location(source_url, license_key)
+        try:
+            with io.open(entry_location, encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return
+
+        if self.is_expired(entry):
+            self._remove(entry_location)
+            return
+
+        # touch the entry such that eviction removes least recently used first
+        try:
+            os.utime(entry_location, None)
+        except OSError:
+            pass
+        return entry
+
+    def iter_entries(self):
+        """
+        Yield tuples of (location, size, last access time) for every cache
+        entry file.
+        """
+        if not os.path.isdir(self.location):
+            return
+        for top, _dirs, files in os.walk(self.location):
+            for file_name in files:
+                if not file_name.endswith('.json'):
+                    continue
+                entry_location = os.path.join(top, file_name)
+                try:
+                    stat = os.stat(entry_location)
+                except OSError:
+                    continue
+                yield entry_location, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """
+        Remove expired entries and then the least recently used entries until
+        the total size of the cache is below the cache maximum size.
+        """
+        now = time.time()
+        entries = []
+        total_size = 0
+        for entry_location, size, last_access in self.iter_entries():
+            # the mtime is the last access time and is never older than the
+            # entry creation time: an entry not used for longer than the TTL
+            # is expired.
+            if now - last_access > max(self.ttl, self.negative_ttl):
+                self._remove(entry_location)
+                continue
+            entries.append((last_access, size, entry_location))
+            total_size += size
+
+        if total_size <= self.max_size:
+            return
+
+        entries.sort()
+        for _last_access, size, entry_location in entries:
+            self._remove(entry_location)
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def clear(self):
+        """
+        Remove all the entries of this cache.
+        """
+        for entry_location, _size, _last_access in list(self.iter_entries()):
+            self._remove(entry_location)
+
+    def _write(self, entry_location, entry):
+        parent = os.path.dirname(entry_location)
+        temp_location = None
+        try:
+            if not os.path.exists(parent):
+                os.makedirs(parent, exist_ok=True)
+            fd, temp_location = tempfile.mkstemp(dir=parent, suffix='.tmp')
+            with io.open(fd, 'w', encoding='utf-8') as temp_file:
+                json.dump(entry, temp_file)
+            os.replace(temp_location, entry_location)
+        except (IOError, OSError, TypeError, ValueError):
+            # a cache that cannot be written to is not an error: the data
+            # will be fetched again on the next run
+            if temp_location:
+                self._remove(temp_location)
+
+    @staticmethod
+    def _remove(entry_location):
+        try:
+            os.remove(entry_location)
+        except OSError:
+            pass
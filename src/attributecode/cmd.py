@@ -32,11 +32,21 @@ from attributecode.util import unique
 
 from attributecode import __version__
 from attributecode import severities
+from attributecode.aggregate import AGGREGATION_MODES
 from attributecode.attrib import check_template
+from attributecode.attrib import get_template_field_names_from_file
+from attributecode.attrib import uses_min_license_score
 from attributecode.attrib import DEFAULT_TEMPLATE_FILE, DEFAULT_LICENSE_SCORE
 from attributecode.attrib import generate_and_save as generate_attribution_doc
+from attributecode.cache import get_default_cache_dir
+from attributecode.cache import LicenseCache
+from attributecode.model import DEFAULT_FETCH_WORKERS
+from attributecode.model import LICENSEDB_URL
+from attributecode.model import mirror_licensedb as mirror_licensedb_files
 from attributecode.model import pre_process_and_fetch_license_dict
-from attributecode.util import filter_errors
+from attributecode.util import EXCEL_ENGINES
+from attributecode.util import ErrorAggregator
+from attributecode.util import ErrorBudget
 from attributecode.util import get_file_text
 from attributecode.util import load_inventory
 from attributecode.util import number_of_component_generated_from_default_template
@@ -114,7 +124,7 @@ def report_errors(errors, quiet, verbose, log_file_loc=None):
     file.
     Return True if there were severe error reported.
     """
-    errors = unique(errors)
+    errors = ErrorAggregator(errors)
     messages, severe_errors_count = get_error_messages(errors, quiet, verbose)
     for msg in messages:
         click.echo(msg)
@@ -128,20 +138,23 @@ def report_errors(errors, quiet, verbose, log_file_loc=None):
 def get_error_messages(errors, quiet=False, verbose=False):
     """
     Return a tuple of (list of error message strings to report,
-    severe_errors_count) given an `errors` list of Error objects and using the
-    `quiet` and `verbose` flags.
+    severe_errors_count) given an `errors` list of Error objects or an
+    ErrorAggregator and using the `quiet` and `verbose` flags. Unless
+    `verbose` is True, the errors of the same kind are reported with a
+    bounded number of messages.
     """
-    errors = unique(errors)
-    severe_errors = filter_errors(errors, WARNING)
-    severe_errors_count = len(severe_errors)
+    if not isinstance(errors, ErrorAggregator):
+        errors = ErrorAggregator(errors)
+    severe_errors_count = errors.count(WARNING)
 
     messages = []
 
-    if severe_errors and not quiet:
+    if severe_errors_count and not quiet:
         error_msg = 'Command completed with {} errors or warnings.'.format(severe_errors_count)
         messages.append(error_msg)
 
-    for severity, message in errors:
+    reported_errors = errors.errors if verbose else errors.get_errors()
+    for severity, message in reported_errors:
         sevcode = severities.get(severity) or 'UNKNOWN'
         msg = '{sevcode}: {message}'.format(**locals())
         if not quiet:
@@ -185,6 +198,21 @@ def parse_key_values(key_values):
 
     return dict(parsed_key_values), sorted(errors)
 
+
+def get_load_license_score(min_license_score, scancode, template_loc):
+    """
+    Return the minimum score of the license detections loaded from a scancode
+    input or None to load all the detections. The detections are only pruned
+    for an explicit `min_license_score` or if the template at `template_loc`
+    filters the licenses on the min_license_score.
+    """
+    if not scancode:
+        return None
+    if min_license_score:
+        return min_license_score
+    if uses_min_license_score(template_loc):
+        return DEFAULT_LICENSE_SCORE
+
 ######################################################################
 # Main Command
 ######################################################################
@@ -207,12 +235,54 @@ def parse_key_values(key_values):
     type=click.Path(exists=True, dir_okay=False, readable=True, resolve_path=True),
     help='Path to an optional YAML configuration file for renaming fields name.')
 
+@click.option('--excel-engine',
+    type=click.Choice(EXCEL_ENGINES),
+    default='openpyxl',
+    show_default=True,
+    help='Library used to read an Excel input: openpyxl or a faster "native" '
+        'reader of the first sheet values.')
+
 @click.option('--djc',
     nargs=2,
     type=click.STRING,
     metavar='URL KEY',
     help='URL to DejaCode License Library and the API KEY. (default: https://scancode-licensedb.aboutcode.org/)')
 
+@click.option('--offline',
+    metavar='DIR',
+    type=click.Path(exists=True, file_okay=False, readable=True, resolve_path=True),
+    help='Path to a local LicenseDB mirror directory created with '
+        '"attributecode-mirror-licensedb". Read the licenses from this directory '
+        'without any network access.')
+
+@click.option('--cache-dir',
+    metavar='DIR',
+    type=click.Path(exists=False, file_okay=False, writable=True, resolve_path=True),
+    help='Path to a directory used to cache the fetched license data across runs. '
+        'Several jobs can share the same directory. (default: ~/.cache/attributecode)')
+
+@click.option('--no-cache',
+    is_flag=True,
+    help='Do not read or save the fetched license data in the license cache.')
+
+@click.option('--workers',
+    type=click.IntRange(min=1),
+    default=DEFAULT_FETCH_WORKERS,
+    show_default=True,
+    help='Maximum number of licenses fetched concurrently.')
+
+@click.option('--processes',
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help='Number of parallel processes used to load the inventory.')
+
+@click.option('--max-errors',
+    type=click.IntRange(min=0),
+    metavar='N',
+    help='Stop as soon as there are more than N errors or warnings and report '
+        'the errors found so far.')
+
 @click.option('--min-license-score',
     type=int,
     help='Attribute components that have license score higher than the defined '
@@ -222,6 +292,24 @@ def parse_key_values(key_values):
     is_flag=True,
     help='Indicate the input JSON file is from scancode_toolkit.')
 
+@click.option('--keep-field',
+    multiple=True,
+    metavar='NAME',
+    help='Name of a ScanCode field to load in addition to the fields used by the '
+        'template. Repeat for each field. Only these fields are loaded if the '
+        'template fields cannot be detected.')
+
+@click.option('--aggregate-by',
+    type=click.Choice(AGGREGATION_MODES),
+    help='Group the ScanCode files in one component per detected package, per '
+        'directory or per package URL and merge their license detections.')
+
+@click.option('--aggregate-depth',
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help='Number of path segments of the directories used with "--aggregate-by directory".')
+
 @click.option('--reference',
     metavar='DIR',
     type=click.Path(exists=True, file_okay=False, readable=True, resolve_path=True),
@@ -250,10 +338,12 @@ def parse_key_values(key_values):
     help='Show all error and warning messages.')
 
 @click.help_option('-h', '--help')
-def attributecode(input, output, configuration, djc, scancode, min_license_score, reference, template, vartext, quiet, verbose):
+def attributecode(input, output, configuration, excel_engine, djc, offline, cache_dir, no_cache, workers, processes, max_errors, scancode, keep_field, aggregate_by, aggregate_depth, min_license_score, reference, template, vartext, quiet, verbose):
     """
     Generate attribution from a JSON, CSV or Excel file.
     """
+    # the license score explicitly requested by the user or None
+    requested_license_score = min_license_score
     if scancode:
         if not input.endswith('.json'):
             msg = 'The input file from scancode toolkit needs to be in JSON format.'
@@ -269,19 +359,62 @@ def attributecode(input, output, configuration, djc, scancode, min_license_score
             click.echo(msg)
             sys.exit(1)
 
+    if aggregate_by and not scancode:
+        msg = ('The "--aggregate-by" option requires a JSON file generated by scancode toolkit as the input. ' +
+                'The "--scancode" option is required.')
+        click.echo(msg)
+        sys.exit(1)
+
+    if keep_field and not scancode:
+        msg = ('The "--keep-field" option requires a JSON file generated by scancode toolkit as the input. ' +
+                'The "--scancode" option is required.')
+        click.echo(msg)
+        sys.exit(1)
+
+    if offline and djc:
+        msg = 'The "--offline" and "--djc" options cannot be used together.'
+        click.echo(msg)
+        sys.exit(1)
+
+    keep_fields = None
+    if scancode:
+        # only load the scancode fields used by the template
+        keep_fields = get_template_field_names_from_file(template)
+        if keep_fields is not None:
+            keep_fields.update(keep_field)
+        elif keep_field:
+            keep_fields = set(keep_field)
+
+    budget = ErrorBudget(max_errors)
     errors, abouts = load_inventory(
         location=input,
         configuration=configuration,
         scancode=scancode,
-        reference_dir=reference
+        reference_dir=reference,
+        excel_engine=excel_engine,
+        processes=processes,
+        budget=budget,
+        keep_fields=keep_fields,
+        min_license_score=get_load_license_score(requested_license_score, scancode, template),
+        aggregate_by=aggregate_by,
+        aggregate_depth=aggregate_depth,
     )
 
-    license_dict, lic_errors = pre_process_and_fetch_license_dict(abouts, djc, scancode, reference)
-    errors.extend(lic_errors)
-    sorted_license_dict = sorted(license_dict)
+    cache = None
+    if not no_cache:
+        cache = LicenseCache(cache_dir or get_default_cache_dir())
+
+    license_dict = {}
+    if not budget.is_exceeded:
+        license_dict, lic_errors = pre_process_and_fetch_license_dict(
+            abouts, djc, scancode, reference, cache=cache, workers=workers, offline=offline,
+            budget=budget)
+        errors.extend(lic_errors)
 
     # Read the license_file and store in a dictionary
     for about in abouts:
+        if budget.is_exceeded:
+            break
         if about.license_file.value or about.notice_file.value:
             if not reference:
                 msg = '"license_file" / "notice_file" field contains value. Use `--reference` to indicate its parent directory.'
@@ -295,6 +428,7 @@ def attributecode(input, output, configuration, djc, scancode, min_license_score
                     about.license_file.value[file_name] = text
                 else:
                     errors.append(error)
+                    budget.extend([error])
             if about.notice_file.value:
                 file_name = about.notice_file.value
                 error, text = get_file_text(file_name, reference)
@@ -303,10 +437,11 @@ def attributecode(input, output, configuration, djc, scancode, min_license_score
                     about.notice_file.value[file_name] = text
                 else:
                     errors.append(error)
+                    budget.extend([error])
 
 
     rendered = ''
-    if abouts:
+    if abouts and not budget.is_exceeded:
         attrib_errors, rendered = generate_attribution_doc(
             abouts=abouts,
             license_dict=dict(sorted(license_dict.items())),
@@ -320,7 +455,10 @@ def attributecode(input, output, configuration, djc, scancode, min_license_score
     errors = unique(errors)
     errors_count = report_errors(errors, quiet, verbose, log_file_loc=output + '-error.log')
 
-    if rendered:
+    if budget.is_exceeded:
+        msg = 'Attribution generation aborted: more than {max_errors} errors or warnings.'.format(**locals())
+        click.echo(msg)
+    elif rendered:
         # Check if the default template is used
         import filecmp
         default_template = os.path.join(os.path.abspath(os.path.dirname(__file__)), '../../templates/default_html.template')
@@ -337,5 +475,49 @@ def attributecode(input, output, configuration, djc, scancode, min_license_score
     sys.exit(errors_count)
 
 
+@click.command()
+@click.version_option(version=__version__, prog_name=prog_name, message=intro)
+@click.argument('location',
+    required=True,
+    metavar='DIR',
+    type=click.Path(exists=False, file_okay=False, writable=True, resolve_path=True))
+
+@click.option('--url',
+    default=LICENSEDB_URL,
+    show_default=True,
+    help='URL of the LicenseDB to mirror.')
+
+@click.option('--workers',
+    type=click.IntRange(min=1),
+    default=DEFAULT_FETCH_WORKERS,
+    show_default=True,
+    help='Maximum number of license files downloaded concurrently.')
+
+@click.option('-q', '--quiet',
+    is_flag=True,
+    help='Do not print error or warning messages.')
+
+@click.option('--verbose',
+    is_flag=True,
+    help='Show all error and warning messages.')
+
+@click.help_option('-h', '--help')
+def mirror_licensedb(location, url, workers, quiet, verbose):
+    """
+    Download the full LicenseDB in the DIR directory for use with the
+    "attributecode --offline DIR" option.
+    """
+    if not url.endswith('/'):
+        url = url + '/'
+    license_count, errors = mirror_licensedb_files(location, url=url, workers=workers)
+    errors_count = report_errors(errors, quiet, verbose)
+    if license_count:
+        msg = '{license_count} license(s) mirrored at: {location}'.format(**locals())
+    else:
+        msg = 'LicenseDB mirroring failed.'
+    click.echo(msg)
+    sys.exit(errors_count)
+
+
 if __name__ == '__main__':
     attributecode()
@@ -18,19 +18,23 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from functools import partial
+import io
 import json
+import os
 
 from itertools import zip_longest  # NOQA
 from urllib.parse import urljoin, urlparse  # NOQA
-from urllib.request import urlopen, Request  # NOQA
 from urllib.error import HTTPError  # NOQA
 
-import urllib.request
-
 from license_expression import Licensing
 
 from attributecode import __version__
 from attributecode import api
+from attributecode import httpclient
 from attributecode import CRITICAL
 from attributecode import ERROR
 from attributecode import INFO
@@ -39,34 +43,56 @@ from attributecode import Error
 from attributecode import util
 
 
+LICENSEDB_URL = 'https://scancode-licensedb.aboutcode.org/'
+
+# maximum number of licenses fetched concurrently
+DEFAULT_FETCH_WORKERS = 8
+
+# maximum number of license keys queried at once in a DejaCode API request
+DEJACODE_BATCH_SIZE = 100
+
+# timeout in seconds of a license fetching HTTP request
+DEFAULT_FETCH_TIMEOUT = 30
+
 
 class Field(object):
     """
     An ABOUT file field. The initial value is a string. Subclasses can and
     will alter the value type as needed.
     """
+    __slots__ = ('name', 'value', '_original_value', 'errors')
 
     def __init__(self, name=None, value=None):
         # normalized names are lowercased per specification
         self.name = name
         # save this and do not mutate it afterwards
-        if isinstance(value, str):
-            self.original_value = value
-        elif value:
-            self.original_value = repr(value)
-        else:
-            self.original_value = value
+        self._original_value = value
 
         # can become a string, list or OrderedDict() after validation
         self.value = value or self.default_value()
         self.errors = []
 
+    @property
+    def original_value(self):
+        """
+        Return the original value as a string. Non-string values such as the
+        lists of a ScanCode scan are only converted when requested.
+        """
+        value = self._original_value
+        if value and not isinstance(value, str):
+            return repr(value)
+        return value
+
+    @original_value.setter
+    def original_value(self, value):
+        self._original_value = value
+
     def default_value(self):
         return ''
 
     @property
     def has_content(self):
-        return self.original_value
+        return self._original_value
 
     def __repr__(self):
         name = self.name
@@ -77,41 +103,45 @@ class Field(object):
 def validate_field_name(name):
     if not util.is_valid_name(name):
         msg = ('Field name: %(name)r is ignored as it contains illegal name characters.')
-        return Error(INFO, msg % locals())
+        return Error(INFO, msg % locals(), kind='illegal-field-name')
+
+STANDARD_FIELD_NAMES = (
+    'name',
+    'version',
+
+    'download_url',
+    'homepage_url',
+    'package_url',
+    'notes',
+
+    'license_expression',
+    'license_key',
+    'license_name',
+    'license_file',
+    'license_url',
+    'copyright',
+    'notice_file',
+)
+
 
 class About(object):
     """
     Create an ABOUT object
+
+    The fields are available as attributes named after the field name. They
+    are looked up in the fields and custom_fields dictionaries rather than
+    stored as instance attributes to keep About objects compact.
     """
+    __slots__ = ('fields', 'custom_fields', 'errors', 'reference_dir')
+
     def set_standard_fields(self):
         """
         Create fields in an ordered dict to keep a standard ordering. We
         could use a metaclass to track ordering django-like but this approach
         is simpler.
         """
-        self.fields = OrderedDict([
-            ('name', Field()),
-            ('version', Field()),
-
-            ('download_url', Field()),
-            ('homepage_url', Field()),
-            ('package_url', Field()),
-            ('notes', Field()),
-
-            ('license_expression', Field()),
-            ('license_key', Field()),
-            ('license_name', Field()),
-            ('license_file', Field()),
-            ('license_url', Field()),
-            ('copyright', Field()),
-            ('notice_file', Field()),
-        ])
-
-        for name, field in self.fields.items():
-            # we could have a hack to get the actual field name
-            # but setting an attribute is explicit and cleaner
-            field.name = name
-            setattr(self, name, field)
+        self.fields = OrderedDict(
+            (name, Field(name=name)) for name in STANDARD_FIELD_NAMES)
 
     def __init__(self, location=None):
         """
@@ -122,6 +152,19 @@ class About(object):
         self.set_standard_fields()
         self.custom_fields = OrderedDict()
         self.errors = []
+        self.reference_dir = None
+
+    def __getattr__(self, name):
+        # only called when there is no regular attribute with this name
+        if name.startswith('__') or name in About.__slots__:
+            raise AttributeError(name)
+        field = self.fields.get(name)
+        if field is None:
+            field = self.custom_fields.get(name)
+        if field is None:
+            raise AttributeError(
+                '%r object has no attribute %r' % (type(self).__name__, name))
+        return field
 
     def __repr__(self):
         return repr(self.all_fields())
@@ -152,7 +195,7 @@ class About(object):
                         msg = (u'Field %(orig_name)s is a duplicate. '
                                u'Original value: "%(previous_value)s" '
                                u'replaced with: "%(value)s"')
-                        errors.append(Error(WARNING, msg % locals()))
+                        errors.append(Error(WARNING, msg % locals(), kind='duplicate-field'))
                         continue
                 seen_fields[name] = value
 
@@ -179,32 +222,38 @@ class About(object):
                     # custom fields are always handled as StringFields
                     custom_field = Field(name=name, value=value)
                     self.custom_fields[name] = custom_field
-                    try:
-                        if name in dir(self):
-                            raise Exception('Illegal field: %(name)r: %(value)r.' % locals())
-                        setattr(self, name, custom_field)
-                    except:
+                    if hasattr(About, name):
+                        # this field would not be available as an attribute
                         msg = 'Internal error with custom field: %(name)r: %(value)r.'
-                        errors.append(Error(CRITICAL, msg % locals()))
+                        errors.append(Error(CRITICAL, msg % locals(), kind='custom-field-error'))
         except AttributeError:
             msg = 'One of the columns does not have column name.'
-            errors.append(Error(CRITICAL, msg % locals()))
+            errors.append(Error(CRITICAL, msg % locals(), kind='unnamed-column'))
 
         return errors
 
-    def process(self, fields, reference_dir=None):
+    def process(self, fields, reference_dir=None, schema=None):
         """
         Validate and set as attributes on this About object a sequence of
         `fields` name/value tuples. Return a list of errors.
+
+        Use the compiled FieldSchema `schema` of the field names if provided.
         """
         self.reference_dir = reference_dir
-        errors = self.hydrate(fields)
+        if schema is not None and not self.custom_fields:
+            errors = schema.hydrate(self, [value for _name, value in fields])
+        else:
+            errors = self.hydrate(fields)
         return errors
 
-    def load_dict(self, fields_dict, scancode =False, reference_dir=None,):
+    def load_dict(self, fields_dict, scancode =False, reference_dir=None, schema=None):
         """
         Load this About object from a `fields_dict` name/value dict.
         Return a list of errors.
+
+        Optionally use a `schema` FieldSchema compiled for the `fields_dict`
+        names. The schema errors are not returned: these should be reported
+        once for all the dicts with the same names.
         """
         errors = []
         # do not keep empty
@@ -229,51 +278,162 @@ class About(object):
                     if special_char_in_expression:
                         msg = ('License expression cannot contains the following special characters: ' +
                                special_char_in_expression)
-                        errors.append(Error(CRITICAL, msg))
+                        errors.append(Error(CRITICAL, msg, kind='license-expression-special-characters'))
 
         process_errors = self.process(
             fields=fields,
             reference_dir=reference_dir,
+            schema=schema,
         )
         if process_errors:
             errors.extend(process_errors)
         self.errors = errors
         return errors
 
-def pre_process_and_fetch_license_dict(abouts, djc, scancode, reference=None):
+class FieldSchema(object):
     """
-    Parse the license expression from the about object and return a dictionary
-    list with license key as a key and its corresponding license information as
-    a value. Note that this value is also a dictionary.
+    A sequence of field `names` validated and classified once such that the
+    rows of an inventory with these names can be loaded in About objects by
+    assigning their values.
+
+    The `errors` are the field names errors, reported once for all the rows.
+    A schema that is not `is_compiled` cannot be used to load rows: for
+    instance its names have duplicates once lowercased. These rows should be
+    loaded with About.hydrate() instead.
     """
-    license_data_dict = {}
-    captured_license = []
-    errors = []
-    if djc:
-        # Strip the ' and " for api_url, and api_key from input
-        url = djc[0].strip("'").strip('"')
-        api_key = djc[1].strip("'").strip('"')
-    else:
-        url = 'https://scancode-licensedb.aboutcode.org/'
-    if util.is_online():
-        if not valid_api_url(url):
-            msg = u"URL not reachable. Invalid 'url'. License generation is skipped."
-            errors.append(Error(ERROR, msg))
-    else:
-        msg = u'Network problem. Please check your Internet connection. License fetching is skipped.'
-        errors.append(Error(ERROR, msg))
+    STANDARD = 1
+    CUSTOM = 2
+    IGNORED = 3
+    # a custom field with the name of an About attribute
+    CONFLICTING = 4
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        # list of (lowercased name, kind) for each name
+        self.columns = []
+        self.errors = []
+        self.is_compiled = self.compile()
 
-    if errors:
-        return license_data_dict, errors
+    def __repr__(self):
+        names = self.names
+        return 'FieldSchema(names=%(names)r)' % locals()
+
+    def compile(self):
+        """
+        Classify the names of this schema. Return True if the rows can be
+        loaded with this schema.
+        """
+        seen_names = set()
+        for name in self.names:
+            if not isinstance(name, str):
+                # a column without name
+                return self.reset()
+            name = name.lower()
+            if name in seen_names:
+                # duplicated fields values are checked row by row
+                return self.reset()
+            seen_names.add(name)
+
+            if name in STANDARD_FIELD_NAMES:
+                self.columns.append((name, self.STANDARD))
+                continue
+            illegal_name_error = validate_field_name(name)
+            if illegal_name_error:
+                self.errors.append(illegal_name_error)
+                self.columns.append((name, self.IGNORED))
+            elif hasattr(About, name):
+                self.columns.append((name, self.CONFLICTING))
+            else:
+                self.columns.append((name, self.CUSTOM))
+        return True
 
+    def reset(self):
+        self.columns = []
+        self.errors = []
+        return False
+
+    def hydrate(self, about, values):
+        """
+        Set the field values of an `about` About object from a sequence of
+        `values` in the order of this schema names. Return a list of errors.
+        """
+        errors = []
+        fields = about.fields
+        custom_fields = about.custom_fields
+        for (name, kind), value in zip(self.columns, values):
+            if kind == self.STANDARD:
+                field = fields[name]
+                field.original_value = value
+                field.value = value
+            elif kind == self.CUSTOM:
+                custom_fields[name] = Field(name=name, value=value)
+            elif kind == self.CONFLICTING:
+                custom_fields[name] = Field(name=name, value=value)
+                msg = 'Internal error with custom field: %(name)r: %(value)r.'
+                errors.append(Error(CRITICAL, msg % locals(), kind='custom-field-error'))
+        return errors
+
+
+class LicenseFetchPlan(object):
+    """
+    A plan of the unique license keys to fetch for a list of About objects.
+    Each license key is recorded with the About objects that can supply a
+    "license_file" fallback when this key is unknown.
+    """
+
+    def __init__(self):
+        # {license key: {license_file: About object}}, in first seen order
+        self.license_files_by_key = OrderedDict()
+        self.errors = []
+
+    def __repr__(self):
+        license_keys = self.license_keys
+        return 'LicenseFetchPlan(license_keys=%(license_keys)r)' % locals()
+
+    def __len__(self):
+        return len(self.license_files_by_key)
+
+    def __iter__(self):
+        return iter(self.license_files_by_key)
+
+    def __contains__(self, license_key):
+        return license_key in self.license_files_by_key
+
+    @property
+    def license_keys(self):
+        return list(self.license_files_by_key)
+
+    def add(self, license_key, about):
+        """
+        Add a `license_key` used by an `about` About object to this plan.
+        """
+        license_files = self.license_files_by_key.get(license_key)
+        if license_files is None:
+            license_files = self.license_files_by_key[license_key] = OrderedDict()
+        license_file = about.license_file.value
+        if license_file and isinstance(license_file, str):
+            license_files.setdefault(license_file, about)
+
+    def get_fallback_abouts(self, license_key):
+        """
+        Return a list of the About objects with a "license_file" that can be
+        used for `license_key`.
+        """
+        return list(self.license_files_by_key.get(license_key, {}).values())
+
+
+def plan_license_fetch(abouts, scancode):
+    """
+    Return a LicenseFetchPlan built from walking once an `abouts` list of
+    About objects. The plan `errors` contains the errors for the license
+    expressions that cannot be parsed.
+    """
+    plan = LicenseFetchPlan()
     for about in abouts:
         lic_list = []
         if scancode:
-            lic_list = []
             # Get all the detected license key from the component.
-            for lic in about.licenses.value:
-                if not lic['key'] in lic_list:
-                    lic_list.append(lic['key'])
+            lic_list = [lic['key'] for lic in about.licenses.value]
         else:
             if not about.license_expression.value:
                 continue
@@ -282,103 +442,408 @@ def pre_process_and_fetch_license_dict(abouts, djc, scancode, reference=None):
                 if special_char_in_expression:
                     msg = (u"The following character(s) cannot be in the license_expression: " +
                            str(special_char_in_expression))
-                    errors.append(Error(ERROR, msg))
+                    plan.errors.append(Error(ERROR, msg, kind='license-expression-characters'))
                     continue
         for lic_key in lic_list:
-            if not lic_key in captured_license:
-                captured_license.append(lic_key)
-                if djc:
-                    # No need to go through all the about objects for license extraction if we detected
-                    # invalid '--api_key'
-                    auth_error = Error(ERROR, u"Authorization denied. Invalid '--api_key'. License generation is skipped.")
-                    if auth_error in errors:
-                        break
-                    license_data, errs = api.get_license_details_from_api(url, api_key, lic_key)
-                    if errs:
-                        for e in errs:
-                            if u"Invalid 'license'" in e.message:
-                                if about.license_file.value:
-                                    file_name = about.license_file.value
-                                    error, text = util.get_file_text(file_name, reference)
-                                    if not error:
-                                        license_dict = {}
-                                        license_dict['key'] = lic_key
-                                        license_dict['license_text'] = text
-                                        license_data_dict[lic_key] = license_dict
-                                    else:
-                                        errors.append(error)
-                                else:
-                                    errors.append(e)
-                            else:
-                                errors.append(e)
-                    else:
-                        license_dict = license_data
-                        license_dict['license_text'] = license_data.get('full_text', '')
-                        license_data_dict[lic_key] = license_dict
+            plan.add(lic_key, about)
+    return plan
+
+
+def pre_process_and_fetch_license_dict(abouts, djc, scancode, reference=None, cache=None,
+                                       workers=DEFAULT_FETCH_WORKERS, timeout=DEFAULT_FETCH_TIMEOUT,
+                                       offline=None, budget=None):
+    """
+    Parse the license expression from the about object and return a dictionary
+    list with license key as a key and its corresponding license information as
+    a value. Note that this value is also a dictionary.
+
+    Optionally use a `cache` LicenseCache to reuse license data fetched by a
+    previous run and to save newly fetched license data.
+
+    The licenses are fetched concurrently using up to `workers` threads and
+    each HTTP request times out after `timeout` seconds.
+
+    If `offline` is the location of a LicenseDB mirror directory, the licenses
+    are read from this directory and no network connection is made.
+
+    Network problems are detected from the actual fetches: the fetching stops
+    after a few consecutive connection failures.
+
+    If an ErrorBudget `budget` is provided, the fetching stops once this budget
+    is exceeded.
+    """
+    if offline:
+        plan = plan_license_fetch(abouts, scancode)
+        return execute_license_fetch_plan(
+            plan,
+            url=offline,
+            offline=True,
+            reference=reference,
+            workers=workers,
+            budget=budget,
+        )
+
+    if djc:
+        # Strip the ' and " for api_url, and api_key from input
+        url = djc[0].strip("'").strip('"')
+        api_key = djc[1].strip("'").strip('"')
+    else:
+        url = LICENSEDB_URL
+        api_key = None
+
+    # there is no connectivity check upfront: a network problem is detected
+    # from the first fetches and the next fetches fail fast
+    plan = plan_license_fetch(abouts, scancode)
+    return execute_license_fetch_plan(
+        plan,
+        url=url,
+        api_key=api_key,
+        djc=bool(djc),
+        reference=reference,
+        cache=cache,
+        workers=workers,
+        timeout=timeout,
+        budget=budget,
+    )
+
+
+def execute_license_fetch_plan(plan, url, api_key=None, djc=False, reference=None, cache=None,
+                               workers=DEFAULT_FETCH_WORKERS, timeout=DEFAULT_FETCH_TIMEOUT,
+                               offline=False, budget=None):
+    """
+    Fetch the licenses of a LicenseFetchPlan `plan` from the LicenseDB or from
+    the DejaCode License Library at `url` if `djc` is True. If `offline` is
+    True, `url` is the location of a local LicenseDB mirror directory. Return a
+    tuple of (dictionary of {license key: license data}, list of errors).
+    Stop early once the ErrorBudget `budget` is exceeded if provided.
+    """
+    license_data_dict = {}
+    errors = list(plan.errors)
+    if not plan:
+        return license_data_dict, errors
+
+    if offline:
+        fetcher = partial(fetch_licenses, partial(fetch_local_license, url))
+        batch_size = 1
+    elif djc:
+        fetcher = partial(fetch_dejacode_licenses, url, api_key, timeout=timeout)
+        batch_size = DEJACODE_BATCH_SIZE
+    else:
+        fetcher = partial(fetch_licenses, partial(fetch_licensedb_license, url, timeout=timeout))
+        batch_size = 1
+
+    if cache:
+        # the DejaCode responses depend on the API key
+        cache_source = cache.get_source_key(url, api_key if djc else None)
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_FETCH_WORKERS) as executor:
+        # map of {license key: future of a batch fetch of this key or a
+        # result tuple for a key cached as missing}
+        results = OrderedDict()
+        lic_keys = []
+        for lic_key in plan:
+            if cache:
+                cached_license_data = cache.get(cache_source, lic_key)
+                if cached_license_data:
+                    license_data_dict[lic_key] = cached_license_data
+                    continue
+                missing_errors = cache.get_missing(cache_source, lic_key)
+                if missing_errors is not None:
+                    results[lic_key] = {}, True, missing_errors
+                    continue
+            lic_keys.append(lic_key)
+            results[lic_key] = None
+
+        for start in range(0, len(lic_keys), batch_size):
+            batch = lic_keys[start:start + batch_size]
+            future = executor.submit(fetcher, batch)
+            for lic_key in batch:
+                results[lic_key] = future
+
+        # process the results in the license keys order to report the errors
+        # in a stable order
+        budgeted_errors_count = 0
+        for lic_key, result in results.items():
+            if budget is not None:
+                exceeded = budget.extend(errors[budgeted_errors_count:])
+                budgeted_errors_count = len(errors)
+                if exceeded:
+                    cancel_futures(results)
+                    break
+
+            fetched = isinstance(result, Future)
+            if fetched:
+                result = result.result()[lic_key]
+            license_dict, not_found, errs = result
+            if license_dict:
+                license_data_dict[lic_key] = license_dict
+                if cache:
+                    cache.put(cache_source, lic_key, license_dict)
+                continue
+
+            if not_found and fetched and cache:
+                # remember the unknown keys to avoid asking again on next runs
+                cache.put_missing(cache_source, lic_key, errs)
+
+            if api.NETWORK_ERROR in errs:
+                # report a network problem only once: the next fetches fail
+                # fast once the connection failures open the circuit breaker
+                if api.NETWORK_ERROR not in errors:
+                    errors.append(api.NETWORK_ERROR)
+                continue
+
+            fatal_errors = [e for e in (api.AUTH_ERROR, api.INVALID_URL_ERROR) if e in errs]
+            if djc and fatal_errors:
+                # No need to go through all the other license keys if we
+                # detected an invalid '--api_key' or API URL
+                errors.extend(fatal_errors)
+                cancel_futures(results)
+                break
+
+            fallback_abouts = plan.get_fallback_abouts(lic_key)
+            if not_found and fallback_abouts:
+                # license key not found in LicenseDB or DejaCode but
+                # license_file field present
+                license_dict, error = get_license_file_fallback(lic_key, fallback_abouts, reference)
+                if license_dict:
+                    license_data_dict[lic_key] = license_dict
                 else:
-                    license_url = url + lic_key + '.json'
-                    license_text_url = ''
-                    try:
-                        json_url = urlopen(license_url)
-                        data = json.loads(json_url.read())
-                        license_text_url = url + data['key'] + '.LICENSE'
-                        license_dict = data
-                        license_text = urllib.request.urlopen(license_text_url).read().decode('utf-8')
-                        license_dict['license_text'] = license_text
-                        license_data_dict[lic_key] = license_dict
-                    except urllib.error.HTTPError:
-                        # license_expression key not found in LicenseDB
-                        # but license_file field present
-                        if about.license_file.value:
-                            file_name = about.license_file.value
-                            error, text = util.get_file_text(file_name, reference)
-                            if not error:
-                                license_dict = {}
-                                license_dict['key'] = lic_key
-                                license_dict['license_text'] = text
-                                license_data_dict[lic_key] = license_dict
-                            else:
-                                errors.append(error)
-                        else:
-                            msg = ("The following URL is not reachable: " + '\n' +
-                                license_url + '\n' + license_text_url)
-                            errors.append(Error(ERROR, msg)) 
-                    except:
-                        msg = "License key, " + lic_key + ", not recognize."
-                        errors.append(Error(ERROR, msg))
+                    errors.append(error)
+                continue
+            errors.extend(errs)
+
+    if budget is not None:
+        budget.extend(errors[budgeted_errors_count:])
+    if cache:
+        cache.evict()
     return license_data_dict, errors
 
-def valid_api_url(api_url):
+
+def cancel_futures(results):
+    """
+    Cancel the pending fetches of a `results` mapping of {license key: future
+    or result}.
+    """
+    for pending in results.values():
+        if isinstance(pending, Future):
+            pending.cancel()
+
+
+def get_license_file_fallback(lic_key, abouts, reference):
+    """
+    Return a tuple of (license data dictionary, error) for a `lic_key` license
+    key using the text of the first readable "license_file" of an `abouts`
+    list of About objects found in the `reference` directory.
+    """
+    first_error = None
+    for about in abouts:
+        file_name = about.license_file.value
+        error, text = util.get_file_text(file_name, reference)
+        if not error:
+            license_dict = {}
+            license_dict['key'] = lic_key
+            license_dict['license_text'] = text
+            return license_dict, None
+        first_error = first_error or error
+    return {}, first_error
+
+
+def fetch_licensedb_license(url, lic_key, timeout=DEFAULT_FETCH_TIMEOUT):
+    """
+    Fetch the license data and text of a `lic_key` license key from the
+    LicenseDB at `url`. Return a tuple of (license data dictionary, not found
+    flag, list of errors).
+    """
+    license_url = url + lic_key + '.json'
+    license_text_url = ''
     try:
-        request = Request(api_url)
-        urlopen(request)
-        return True
+        json_url = httpclient.get(license_url, timeout=timeout)
+        data = json.loads(json_url.read())
+        license_text_url = url + data['key'] + '.LICENSE'
+        license_dict = data
+        license_text = httpclient.get(license_text_url, timeout=timeout).read().decode('utf-8')
+        license_dict['license_text'] = license_text
+        return license_dict, False, []
     except HTTPError as http_e:
-        # The 403 error code is refer to "Authentication credentials were not provided.".
-        # This is correct as no key are provided.
-        if http_e.code == 403:
-            return True
+        # license_expression key not found in LicenseDB
+        msg = ("The following URL is not reachable: " + '\n' +
+            license_url + '\n' + license_text_url)
+        not_found = http_e.code in (404, 410)
+        return {}, not_found, [Error(ERROR, msg, kind='unreachable-license-url')]
+    except OSError:
+        # connection errors, timeouts and open circuit breaker
+        return {}, False, [api.NETWORK_ERROR]
+    except:
+        msg = "License key, " + lic_key + ", not recognize."
+        return {}, False, [Error(ERROR, msg)]
+
+
+def fetch_local_license(location, lic_key):
+    """
+    Read the license data and text of a `lic_key` license key from the
+    LicenseDB mirror directory at `location`. Return a tuple of (license data
+    dictionary, not found flag, list of errors).
+    """
+    license_location = os.path.join(location, lic_key + '.json')
+    license_text_location = os.path.join(location, lic_key + '.LICENSE')
+    if not (os.path.exists(license_location) and os.path.exists(license_text_location)):
+        msg = ("The following license files do not exist: " + '\n' +
+            license_location + '\n' + license_text_location)
+        return {}, True, [Error(ERROR, msg, kind='missing-license-files')]
+    try:
+        with io.open(license_location, encoding='utf-8') as license_file:
+            license_dict = json.load(license_file)
+        with io.open(license_text_location, encoding='utf-8') as license_text_file:
+            license_dict['license_text'] = license_text_file.read()
+        return license_dict, False, []
     except:
-        # All other exceptions yield to invalid api_url
-        pass
-    return False
+        msg = "License key, " + lic_key + ", not recognize."
+        return {}, False, [Error(ERROR, msg)]
+
+
+def fetch_licenses(fetcher, lic_keys):
+    """
+    Fetch each license key of a `lic_keys` list with a `fetcher` callable
+    accepting a license key. Return a mapping of {license key: tuple of
+    (license data dictionary, not found flag, list of errors)}.
+    """
+    return OrderedDict((lic_key, fetcher(lic_key)) for lic_key in lic_keys)
+
+
+def fetch_dejacode_licenses(url, api_key, lic_keys, timeout=DEFAULT_FETCH_TIMEOUT):
+    """
+    Fetch the license data and text of a `lic_keys` list of license keys from
+    the DejaCode License Library API at `url` using `api_key` with as few
+    requests as possible. Return a mapping of {license key: tuple of (license
+    data dictionary, not found flag, list of errors)}.
+    """
+    licenses_data, errors = api.get_licenses_details_from_api(url, api_key, lic_keys, timeout=timeout)
+    # errors such as an authorization or network error that apply to all keys
+    batch_errors = [e for e in errors if not e.message.startswith(u"Invalid 'license'")]
+    unique_errors = set(errors)
+
+    results = OrderedDict()
+    for lic_key in lic_keys:
+        license_data = licenses_data.get(lic_key)
+        if license_data:
+            license_data['license_text'] = license_data.get('full_text', '')
+            results[lic_key] = license_data, False, []
+            continue
+        invalid_license_error = Error(ERROR, u"Invalid 'license': %s" % lic_key, kind='invalid-license-key')
+        if invalid_license_error in unique_errors:
+            results[lic_key] = {}, True, [invalid_license_error]
+        else:
+            results[lic_key] = {}, False, batch_errors
+    return results
+
+
+def mirror_licensedb(location, url=LICENSEDB_URL, workers=DEFAULT_FETCH_WORKERS,
+                     timeout=DEFAULT_FETCH_TIMEOUT):
+    """
+    Download the LicenseDB index and the .json and .LICENSE files of every
+    license from the LicenseDB at `url` in the `location` directory. Return a
+    tuple of (number of licenses listed in the index, list of errors).
+    """
+    errors = []
+    util.create_dir(location)
+    index_url = url + 'index.json'
+    try:
+        index_content = httpclient.get(index_url, timeout=timeout).read()
+        index = json.loads(index_content)
+    except Exception as e:
+        msg = "Cannot fetch the LicenseDB index at " + index_url + ": " + str(e)
+        errors.append(Error(ERROR, msg, kind='licensedb-index-fetch-failure'))
+        return 0, errors
+
+    with io.open(os.path.join(location, 'index.json'), 'wb') as index_file:
+        index_file.write(index_content)
+
+    file_names = []
+    for entry in index:
+        license_key = entry.get('license_key')
+        if not license_key:
+            continue
+        for file_name in (entry.get('json') or license_key + '.json',
+                          entry.get('license') or license_key + '.LICENSE'):
+            if not is_plain_file_name(file_name):
+                # never write outside of the mirror directory
+                msg = "Invalid file name in the LicenseDB index: %r" % file_name
+                errors.append(Error(ERROR, msg, kind='invalid-licensedb-file-name'))
+                continue
+            file_names.append(file_name)
+
+    def download(file_name):
+        file_url = url + file_name
+        try:
+            content = httpclient.get(file_url, timeout=timeout).read()
+        except Exception as e:
+            msg = "Cannot fetch " + file_url + ": " + str(e)
+            return Error(ERROR, msg, kind='licensedb-file-fetch-failure')
+        with io.open(os.path.join(location, file_name), 'wb') as target:
+            target.write(content)
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_FETCH_WORKERS) as executor:
+        for error in executor.map(download, file_names):
+            if error:
+                errors.append(error)
+
+    return len(index), errors
+
+
+def is_plain_file_name(file_name):
+    """
+    Return True if `file_name` is a file name without any directory such that
+    it cannot point outside of a directory.
+    """
+    return (
+        bool(file_name)
+        and file_name not in ('.', '..')
+        and '/' not in file_name
+        and '\\' not in file_name
+        and ':' not in file_name
+        and '\0' not in file_name
+    )
+
+
+# maximum number of distinct license expressions kept parsed in memory
+LICENSE_EXPRESSION_CACHE_SIZE = 4096
+
+# the Licensing is shared by all the license expression parsing
+licensing = Licensing()
+
 
 def parse_license_expression(lic_expression):
-    licensing = Licensing()
+    """
+    Return a tuple of (list of unsupported special characters, list of
+    license keys) for a `lic_expression` string. The expression is not parsed
+    if it contains special characters.
+    """
+    special_char, lic_list = _parse_license_expression(lic_expression)
+    # return new lists as the callers may modify them
+    return list(special_char), list(lic_list)
+
+
+@lru_cache(maxsize=LICENSE_EXPRESSION_CACHE_SIZE)
+def _parse_license_expression(lic_expression):
     lic_list = []
     special_char = detect_special_char(lic_expression)
     if not special_char:
         # Parse the license expression and save it into a list
         lic_list = licensing.license_keys(lic_expression)
-    return special_char, lic_list
+    return tuple(special_char), tuple(lic_list)
 
-def detect_special_char(expression):
-    not_support_char = [
-        '!', '@', '#', '$', '%', '^', '&', '*', '=', '{', '}',
-        '|', '[', ']', '\\', ':', ';', '<', '>', '?', ',', '/']
-    special_character = []
-    for char in not_support_char:
-        if char in expression:
-            special_character.append(char)
-    return special_character
 
+NOT_SUPPORTED_CHARS = [
+    '!', '@', '#', '$', '%', '^', '&', '*', '=', '{', '}',
+    '|', '[', ']', '\\', ':', ';', '<', '>', '?', ',', '/']
+
+
+def detect_special_char(expression):
+    """
+    Return the list of unsupported special characters found in an
+    `expression` string in the NOT_SUPPORTED_CHARS order.
+    """
+    found = set(expression).intersection(NOT_SUPPORTED_CHARS)
+    if not found:
+        return []
+    return [char for char in NOT_SUPPORTED_CHARS if char in found]
@@ -19,10 +19,11 @@ from __future__ import unicode_literals
 
 import codecs
 from collections import OrderedDict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import io
 import json
 import ntpath
-import openpyxl
 import os
 import posixpath
 import re
@@ -34,10 +35,15 @@ import yaml
 
 from attributecode import CRITICAL
 from attributecode import ERROR
+from attributecode import INFO
+from attributecode import NOTSET
 from attributecode import WARNING
 from attributecode import Error
+from attributecode import aggregate
 from attributecode import model
+from attributecode import xlsx
 
+from itertools import islice
 from itertools import zip_longest  # NOQA
 
 import csv  # NOQA
@@ -70,95 +76,420 @@ Return True if a string s  name is safe to use as an attribute name.
 is_valid_name = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$').match
 
 
+class FieldMapping(object):
+    """
+    A field renaming mapping of {current name: new name} loaded once from a
+    YAML configuration file and shared by all the inventory loaders.
+
+    The `errors` are the INFO errors for the mapped names that are not found
+    in the inventory columns or the first inventory record.
+    """
+
+    def __init__(self, mapping=None):
+        self.mapping = dict(mapping or {})
+        # list of (current name, new name) to rename in place
+        self.renames = list(self.mapping.items())
+        self.errors = []
+        self.validated = False
+
+    def __repr__(self):
+        mapping = self.mapping
+        return 'FieldMapping(%(mapping)r)' % locals()
+
+    def __bool__(self):
+        return bool(self.mapping)
+
+    @classmethod
+    def from_file(cls, location):
+        """
+        Return a FieldMapping loaded from the YAML file at `location`.
+        """
+        with open(location) as file:
+            return cls(yaml.safe_load(file))
+
+    def rename(self, name):
+        """
+        Return the new name of a `name`.
+        """
+        return self.mapping.get(name, name)
+
+    def rename_columns(self, names):
+        """
+        Return a list of new names for a `names` sequence of column names and
+        validate the mapping against these names.
+        """
+        self.validate(names)
+        return [self.mapping.get(name, name) for name in names]
+
+    def rename_in_place(self, item):
+        """
+        Rename the keys of an `item` mapping in place and return this item.
+        The renamed keys are moved to the end of the item.
+
+        All the mapped keys are removed before adding their new names such
+        that swapped or chained names do not overwrite each other values.
+        """
+        renamed = [(new_name, item.pop(name)) for name, new_name in self.renames if name in item]
+        for new_name, value in renamed:
+            item[new_name] = value
+        return item
+
+    def validate(self, names):
+        """
+        Record an error for each mapped name missing from a `names` sequence
+        of column or field names. Only the first names are validated.
+        """
+        if self.validated:
+            return
+        self.validated = True
+        names = set(names)
+        for name in self.mapping:
+            if name not in names:
+                msg = 'Field name: %(name)r of the configuration is not found in the input.'
+                self.errors.append(Error(INFO, msg % locals(), kind='unmapped-field-name'))
+
+
+def get_field_mapping(configuration=None):
+    """
+    Return a FieldMapping for a `configuration` YAML file location or
+    FieldMapping.
+    """
+    if isinstance(configuration, FieldMapping):
+        return configuration
+    if configuration:
+        return FieldMapping.from_file(configuration)
+    return FieldMapping()
+
+
 def load_csv(location, configuration=None):
     """
     Read CSV at `location`, return a list of ordered dictionaries, one
     for each row.
     """
-    results = []
-    mapping_dict = {}
-    if configuration:
-        with open(configuration) as file:
-            mapping_dict = yaml.safe_load(file)
+    return list(iter_csv(location, configuration))
+
+
+def iter_csv(location, configuration=None):
+    """
+    Read CSV at `location` and yield an ordered dictionary for each row. Rows
+    are read lazily, one at a time.
+    """
+    _errors, rows = iter_csv_inventory(location, configuration, check_columns=False)
+    return rows
+
+
+def iter_csv_inventory(location, configuration=None, check_columns=True):
+    """
+    Read the CSV inventory at `location` and return a tuple of (list of errors,
+    iterable of ordered dictionaries, one for each row). The file is read once:
+    the header row is read and checked for duplicated column names first and
+    the other rows are then read lazily.
+
+    The column names are renamed with the optional `configuration` mapping
+    file or FieldMapping and lowercased once for all the rows.
+    """
+    mapping = get_field_mapping(configuration)
+
     # FIXME: why ignore encoding errors here?
-    with codecs.open(location, mode='rb', encoding='utf-8-sig',
-                     errors='ignore') as csvfile:
-        for row in csv.DictReader(csvfile):
-            # convert all the column keys to lower case
-            updated_row = OrderedDict()
-            for key, value in row.items():
-                if key in mapping_dict:
-                    key = mapping_dict[key]
-                updated_row[key.lower()] = value
-            results.append(updated_row)
-    return results
+    csvfile = codecs.open(add_unc(location), mode='rb', encoding='utf-8-sig', errors='ignore')
+    reader = csv.reader(csvfile)
+    columns = next(reader, None) or []
 
+    if check_columns:
+        errors = get_duplicated_columns_errors(columns)
+        if errors:
+            csvfile.close()
+            return errors, []
 
-def load_excel(location, configuration=None):
+    # convert all the column keys to lower case
+    keys = [key.lower() for key in mapping.rename_columns(columns)]
+    return [], _iter_csv_rows(csvfile, reader, keys)
+
+
+def _iter_csv_rows(csvfile, reader, keys):
     """
-    Read Excel at `location`, return a list of ordered dictionaries, one
-    for each row.
+    Yield an ordered dictionary keyed by `keys` for each row of a csv `reader`
+    and close the `csvfile` when done. Like with a csv.DictReader, missing
+    values are None and extra values are listed under a None key.
     """
-    results = []
-    errors = []
-    sheet_obj = openpyxl.load_workbook(location).active
-    max_col = sheet_obj.max_column
+    keys_count = len(keys)
+    try:
+        for row in reader:
+            if not row:
+                continue
+            values_count = len(row)
+            if values_count == keys_count:
+                yield OrderedDict(zip(keys, row))
+                continue
+            updated_row = OrderedDict(zip(keys, row))
+            if values_count < keys_count:
+                for key in keys[values_count:]:
+                    updated_row[key] = None
+            else:
+                updated_row[None] = row[keys_count:]
+            yield updated_row
+    finally:
+        csvfile.close()
+
+
+EXCEL_ENGINES = ('openpyxl', 'native')
+
+
+def load_excel(location, configuration=None, engine='openpyxl'):
+    """
+    Read Excel at `location`, return a tuple of (list of errors, list of
+    ordered dictionaries, one for each row).
+    """
+    errors, rows = iter_excel(location, configuration, engine)
+    return errors, list(rows)
+
+
+def iter_excel(location, configuration=None, engine='openpyxl'):
+    """
+    Read the first sheet of the Excel workbook at `location` and return a
+    tuple of (list of errors, iterable of ordered dictionaries, one for each
+    row). The header row is read and checked for duplicated column names
+    first. The other rows are then read lazily.
+
+    The workbook is read with openpyxl in read-only mode or directly from its
+    XML files using the "native" `engine`. The formula cells values are their
+    formula text.
+    """
+    mapping = get_field_mapping(configuration)
+
+    if engine == 'native':
+        rows = xlsx.iter_rows(location)
+        close = rows.close
+    else:
+        import openpyxl
+        workbook = openpyxl.load_workbook(location, read_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        close = workbook.close
+    header = next(rows, None) or ()
 
-    index = 1
     col_keys = []
-    mapping_dict = {}
-    if configuration:
-        with open(configuration) as file:
-            mapping_dict = yaml.safe_load(file)
-    while index <= max_col:
-        value = sheet_obj.cell(row=1, column=index).value
+    for value in header:
         if value in col_keys:
-            msg = 'Duplicated column name, ' + str(value) + ', detected.' 
-            errors.append(Error(CRITICAL, msg))
-            return errors, results
-        if value in mapping_dict:
-            value = mapping_dict[value]
+            close()
+            msg = 'Duplicated column name, ' + str(value) + ', detected.'
+            return [Error(CRITICAL, msg, kind='duplicate-column-name')], []
         col_keys.append(value)
-        index = index + 1
-
-    for row in sheet_obj.iter_rows(min_row=2, values_only=True):
-        row_dict = OrderedDict()
-        index = 0
-        while index < max_col:
-            value = row[index]
-            if value:
-                row_dict[col_keys[index]] = value
-            else:
-                row_dict[col_keys[index]] = ''
-            index = index + 1
-        results.append(row_dict)
-    return errors, results
+    col_keys = mapping.rename_columns(col_keys)
+
+    return [], _iter_excel_rows(rows, col_keys, close)
 
 
-def load_scancode_json(location, configuration=None):
+def _iter_excel_rows(rows, col_keys, close):
+    """
+    Yield an ordered dictionary keyed by `col_keys` for each of the `rows`
+    tuples of values and call `close` when done.
+    """
+    try:
+        for row in rows:
+            row_dict = OrderedDict()
+            for key, value in zip_longest(col_keys, row[:len(col_keys)]):
+                row_dict[key] = value or ''
+            yield row_dict
+    finally:
+        close()
+
+
+def load_scancode_json(location, configuration=None, keep_fields=None, min_license_score=None):
     """
     Read the scancode JSON file at `location` and return a list of dictionaries.
     """
-    mapping_dict = {}
-    updated_results = []
-    if configuration:
-        with open(configuration) as file:
-            mapping_dict = yaml.safe_load(file)
+    return list(iter_scancode_json(location, configuration, keep_fields, min_license_score))
+
+
+# the scancode fields always loaded in About objects
+SCANCODE_REQUIRED_FIELDS = model.STANDARD_FIELD_NAMES + ('licenses', 'license_expressions',)
+
+
+def iter_scancode_json(location, configuration=None, keep_fields=None, min_license_score=None):
+    """
+    Read the scancode JSON file at `location` and yield a dictionary for each
+    of its "files" entries. The file is parsed incrementally such that only
+    one entry is loaded in memory at a time.
+
+    The entries keys are renamed in place with the optional `configuration`
+    mapping file or FieldMapping.
+
+    If `keep_fields` is provided, only the (renamed) entries keys that are in
+    `keep_fields` are kept.
+
+    If `min_license_score` is provided, only the license detections with this
+    score or more are kept and the entries without such detections are
+    skipped.
+    """
+    mapping = get_field_mapping(configuration)
+    if keep_fields is not None:
+        keep_fields = frozenset(keep_fields)
     with open(location) as json_file:
-        results = json.load(json_file)
-    results = results['files']
-    if mapping_dict:
-        for item in results:
-            updated_item = {}
-            for key in item:
-                if key in mapping_dict:
-                    updated_item[mapping_dict[key]] = item[key]
-                else:
-                    updated_item[key] = item[key]
-            updated_results.append(updated_item)
-    else:
-        updated_results = results
-    return updated_results
+        for item in iter_json_array_items(json_file, 'files'):
+            if mapping:
+                mapping.validate(item)
+                mapping.rename_in_place(item)
+            if min_license_score is not None:
+                item = filter_license_detections(item, min_license_score)
+                if item is None:
+                    continue
+            if keep_fields is not None:
+                item = project_fields(item, keep_fields)
+            yield item
+
+
+def filter_license_detections(item, min_license_score):
+    """
+    Return the scancode `item` dictionary with only its license detections
+    that have a score of `min_license_score` or more, or None if there is no
+    such detection.
+    """
+    licenses = [
+        lic for lic in item.get('licenses') or []
+        if (lic.get('score') or 0) >= min_license_score
+    ]
+    if not licenses:
+        return None
+    item['licenses'] = licenses
+    return item
+
+
+def iter_aggregated_scancode_json(location, configuration=None, mode='package', depth=1,
+                                  keep_fields=None, min_license_score=None, processes=1):
+    """
+    Yield a dictionary for each component aggregating the "files" entries of
+    the scancode JSON file at `location` grouped by `mode`, one of
+    aggregate.AGGREGATION_MODES. See `iter_scancode_json` for the other
+    arguments.
+    """
+    read_fields = keep_fields
+    if keep_fields is not None:
+        read_fields = set(keep_fields).union(aggregate.AGGREGATION_FIELDS)
+    # the files without licenses are read as they can be package manifests:
+    # the detections are filtered when merging
+    records = iter_scancode_json(location, configuration, read_fields)
+    components = aggregate.aggregate_records(
+        records, mode, depth, min_license_score, processes)
+    for component in components:
+        if keep_fields is not None:
+            component = project_fields(component, keep_fields)
+        yield component
+
+
+def project_fields(item, keep_fields):
+    """
+    Return a new dictionary with only the keys of an `item` dictionary that
+    are in the `keep_fields` set.
+    """
+    return type(item)((key, value) for key, value in item.items() if key in keep_fields)
+
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+JSON_WHITESPACES = ' \t\n\r'
+
+
+def iter_json_array_items(stream, key, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Yield each item of the array value of the `key` member of the JSON object
+    read from a text `stream`. The stream is read and parsed incrementally by
+    chunks of about `chunk_size` characters: only the item being parsed is
+    kept in memory and the other top-level values are parsed and discarded.
+    """
+    reader = _JsonStreamReader(stream, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        member_key = reader.decode_value()
+        reader.expect(':')
+        if member_key != key:
+            # skip this value
+            reader.decode_value()
+        else:
+            reader.expect('[')
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.decode_value()
+                if reader.expect(',]') == ']':
+                    # there is no need to read the remaining values
+                    return
+        if reader.expect(',}') == '}':
+            return
+
+
+class _JsonStreamReader(object):
+    """
+    Parse JSON values incrementally from a text stream.
+    """
+    def __init__(self, stream, chunk_size=JSON_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self):
+        """
+        Read more characters from the stream, dropping the consumed ones.
+        Return False at the end of the stream.
+        """
+        if self.eof:
+            return False
+        # read at least as much as what is buffered to parse large values in
+        # linear time
+        size = max(self.chunk_size, len(self.buffer) - self.position)
+        chunk = self.stream.read(size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """
+        Return the next non-whitespace character without consuming it or an
+        empty string at the end of the stream.
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in JSON_WHITESPACES:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                return ''
+
+    def expect(self, characters):
+        """
+        Consume and return the next non-whitespace character. Raise a
+        ValueError if this is not one of `characters`.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(
+                'Invalid JSON: expected one of %r at: %r' % (characters, self.buffer[self.position:][:20]))
+        self.position += 1
+        return character
+
+    def decode_value(self):
+        """
+        Consume and return the next JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.read_more():
+                    continue
+                raise
+            if end == len(self.buffer) and self.read_more():
+                # a number or literal may continue in the next chunk
+                continue
+            self.position = end
+            return value
 
 
 def load_json(location):
@@ -175,21 +506,6 @@ def load_json(location):
     return results
 
 
-def is_online():
-    """
-    Return True if an HTTP connection to some public web site is possible.
-    """
-    import socket
-    import http.client as httplib  # NOQA
-
-    http_connection = httplib.HTTPConnection('dejacode.org', timeout=10)  # NOQA
-    try:
-        http_connection.connect()
-    except socket.error:
-        return False
-    else:
-        return True
-
 def add_unc(location):
     """
     Convert a `location` to an absolute Window UNC path to support long paths on
@@ -211,9 +527,17 @@ def unique(sequence):
     [1, 5, 3]
     """
     deduped = []
+    seen = set()
     for item in sequence:
-        if item not in deduped:
-            deduped.append(item)
+        try:
+            if item in seen:
+                continue
+            seen.add(item)
+        except TypeError:
+            # an unhashable item
+            if item in deduped:
+                continue
+        deduped.append(item)
     return deduped
 
 
@@ -225,6 +549,141 @@ def filter_errors(errors, minimum_severity=WARNING):
     return unique([e for e in errors if e.severity >= minimum_severity])
 
 
+# maximum number of errors reported for each kind of error
+ERROR_SAMPLES_SIZE = 5
+
+
+class ErrorGroup(object):
+    """
+    The errors of the same severity and kind: a count of unique errors and
+    the first of these errors as samples.
+    """
+    __slots__ = ('severity', 'kind', 'count', 'samples')
+
+    def __init__(self, severity, kind):
+        self.severity = severity
+        self.kind = kind
+        self.count = 0
+        self.samples = []
+
+    def __repr__(self):
+        severity = self.severity
+        kind = self.kind
+        count = self.count
+        return 'ErrorGroup(severity=%(severity)r, kind=%(kind)r, count=%(count)r)' % locals()
+
+    def get_errors(self):
+        """
+        Return a list of Error: the samples, followed by an Error with the
+        count of the errors not sampled if any.
+        """
+        errors = list(self.samples)
+        omitted = self.count - len(self.samples)
+        if omitted:
+            kind = self.kind
+            msg = ('%(omitted)d more errors of the kind "%(kind)s" are not reported. '
+                   'Use --verbose to report all the errors.')
+            errors.append(Error(self.severity, msg % locals(), kind=kind))
+        return errors
+
+
+class ErrorAggregator(object):
+    """
+    Collect unique errors grouped by severity and kind keeping the count of
+    errors and a bounded sample of errors for each group, such that reporting
+    the same problem found in many inventory rows is compact. The kind of an
+    error is the kind identifier of its message template: an error without a
+    kind is only grouped with the identical errors.
+    """
+
+    def __init__(self, errors=(), samples_size=ERROR_SAMPLES_SIZE):
+        self.samples_size = samples_size
+        # {(severity, kind): ErrorGroup}
+        self.groups = OrderedDict()
+        # all the unique errors in their original order
+        self.errors = []
+        self._seen = set()
+        self.extend(errors)
+
+    def __len__(self):
+        return len(self.errors)
+
+    def add(self, error):
+        """
+        Add an `error` Error unless an identical error was already added.
+        """
+        if error in self._seen:
+            return
+        self._seen.add(error)
+        self.errors.append(error)
+        severity, message = error
+        key = severity, getattr(error, 'kind', None) or message
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = ErrorGroup(*key)
+        group.count += 1
+        if len(group.samples) < self.samples_size:
+            group.samples.append(error)
+
+    def extend(self, errors):
+        for error in errors:
+            self.add(error)
+
+    def count(self, minimum_severity=NOTSET):
+        """
+        Return the number of errors that have a severity of at least
+        `minimum_severity`.
+        """
+        return sum(group.count for group in self.groups.values()
+                   if group.severity >= minimum_severity)
+
+    def get_errors(self, minimum_severity=NOTSET):
+        """
+        Return a list of Error to report, grouped by kind, for the errors that
+        have a severity of at least `minimum_severity`. An error is reported as
+        is when there are only a few errors of its kind.
+        """
+        errors = []
+        for group in self.groups.values():
+            if group.severity >= minimum_severity:
+                errors.extend(group.get_errors())
+        return errors
+
+
+class ErrorBudget(object):
+    """
+    A maximum number `max_errors` of unique errors or warnings for a run. The
+    inventory loading, the license fetching and the rendering stop early once
+    the budget is exceeded. There is no limit if `max_errors` is None.
+    """
+
+    def __init__(self, max_errors=None, minimum_severity=WARNING):
+        self.max_errors = max_errors
+        self.minimum_severity = minimum_severity
+        self._seen = set()
+
+    def __repr__(self):
+        max_errors = self.max_errors
+        count = len(self._seen)
+        return 'ErrorBudget(max_errors=%(max_errors)r, count=%(count)r)' % locals()
+
+    def extend(self, errors):
+        """
+        Count the `errors` iterable of Error. Return True if the budget is
+        exceeded.
+        """
+        if self.max_errors is None:
+            return False
+        for error in errors:
+            if error.severity >= self.minimum_severity:
+                self._seen.add(error)
+        return self.is_exceeded
+
+    @property
+    def is_exceeded(self):
+        return self.max_errors is not None and len(self._seen) > self.max_errors
+
+
 def create_dir(location):
     """
     Create directory or directory tree at location, ensuring it is readable
@@ -272,7 +731,7 @@ def get_file_text(file_name, reference):
     file_path = os.path.join(reference, file_name)
     if not os.path.exists(file_path):
         msg = "The file " + file_path + " does not exist"
-        error = Error(CRITICAL, msg)
+        error = Error(CRITICAL, msg, kind='missing-file')
     else:
         with codecs.open(file_path, 'rb', encoding='utf-8-sig', errors='replace') as txt:
         #with io.open(file_path, encoding='utf-8') as txt:
@@ -289,7 +748,14 @@ def check_duplicated_columns(location):
         reader = csv.reader(csvfile)
         columns = next(reader)
         columns = [col for col in columns]
+    return get_duplicated_columns_errors(columns)
+
 
+def get_duplicated_columns_errors(columns):
+    """
+    Return a list of errors for the duplicated names of a `columns` list of
+    column names, ignoring case.
+    """
     seen = set()
     dupes = OrderedDict()
     for col in columns:
@@ -311,8 +777,8 @@ def check_duplicated_columns(location):
         dup_msg = u', '.join(dup_msg)
         msg = ('Duplicated column name(s): %(dup_msg)s\n' % locals() +
                'Please correct the input and re-run.')
-        errors.append(Error(ERROR, msg))
-    return unique(errors)
+        errors.append(Error(ERROR, msg, kind='duplicate-column-names'))
+    return errors
 
 def check_newline_in_file_field(component):
     """
@@ -325,59 +791,196 @@ def check_newline_in_file_field(component):
                 if '\n' in component[k]:
                     msg = ("New line character detected in '%s' for '%s' which is not supported."
                             "\nPlease use ',' to declare multiple files.") % (k, component['about_resource'])
-                    errors.append(Error(CRITICAL, msg))
+                    errors.append(Error(CRITICAL, msg, kind='newline-in-file-field'))
             except:
                 pass
     return errors
 
-def load_inventory(location, configuration=None, scancode=False, reference_dir=None):
+def load_inventory(location, configuration=None, scancode=False, reference_dir=None,
+                   excel_engine='openpyxl', processes=1, budget=None, keep_fields=None,
+                   min_license_score=None, aggregate_by=None, aggregate_depth=1):
     """
     Load the inventory file at `location` 
 
     Optionally use `reference_dir` as the directory location of extra reference
     license and notice files to reuse.
+
+    Excel inventories are read using the `excel_engine`, one of EXCEL_ENGINES.
+
+    If `processes` is more than one, the inventory rows are hydrated by chunks
+    in a pool of this number of processes.
+
+    If an ErrorBudget `budget` is provided, the loading stops once this budget
+    is exceeded and the errors and About objects loaded so far are returned.
+
+    If `keep_fields` is provided for a `scancode` inventory, only these
+    fields and the SCANCODE_REQUIRED_FIELDS are loaded in the About objects.
+
+    If `min_license_score` is provided for a `scancode` inventory, the license
+    detections with a lower score and the resources without any remaining
+    license detection are not loaded.
+
+    If `aggregate_by` is provided for a `scancode` inventory, one of
+    aggregate.AGGREGATION_MODES, the files are grouped by package, by
+    directory prefix of `aggregate_depth` segments or by package URL and each
+    group is loaded as one About object with the merged license detections.
+    The whole scan is then read before hydrating the About objects.
+
+    The inventory rows are streamed: each row is read, checked and hydrated
+    as an About object one at a time.
     """
     errors = []
     abouts = []
+    # the configuration is loaded once and shared by the loaders
+    mapping = get_field_mapping(configuration)
     if scancode:
-        inventory = load_scancode_json(location, configuration)
+        if keep_fields is not None:
+            keep_fields = set(keep_fields).union(SCANCODE_REQUIRED_FIELDS)
+        if aggregate_by:
+            inventory = iter_aggregated_scancode_json(
+                location, mapping, aggregate_by, aggregate_depth, keep_fields,
+                min_license_score, processes)
+        else:
+            inventory = iter_scancode_json(location, mapping, keep_fields, min_license_score)
     else:
         if location.endswith('.csv'):
-            dup_cols_err = check_duplicated_columns(location)
+            dup_cols_err, inventory = iter_csv_inventory(location, mapping)
             if dup_cols_err:
                 errors.extend(dup_cols_err)
+                if budget is not None:
+                    budget.extend(errors)
                 return errors, abouts
-            inventory = load_csv(location, configuration)
         elif location.endswith('.xlsx'):
-            dup_cols_err, inventory = load_excel(location, configuration)
+            dup_cols_err, inventory = iter_excel(location, mapping, excel_engine)
             if dup_cols_err:
                 errors.extend(dup_cols_err)
+                if budget is not None:
+                    budget.extend(errors)
                 return errors, abouts
         else:
             inventory = load_json(location)
 
-    errors = []
-    for component in inventory:
-        newline_in_file_err = check_newline_in_file_field(component)
-        for err in newline_in_file_err:
-            errors.append(err)
+    if processes > 1:
+        about_results = iter_abouts_in_processes(inventory, scancode, reference_dir, processes)
+    else:
+        about_results = iter_abouts(inventory, scancode, reference_dir)
 
-    if errors:
-        return errors, abouts
+    newline_errors = []
+    seen_errors = set()
+    for about, about_errors in about_results:
+        if about is None:
+            newline_errors.extend(about_errors)
+        else:
+            for e in about_errors:
+                if e not in seen_errors:
+                    seen_errors.add(e)
+                    errors.append(e)
+            abouts.append(about)
+        if budget is not None and budget.extend(about_errors):
+            # stop reading and hydrating the rest of the inventory
+            about_results.close()
+            break
+
+    if newline_errors:
+        return newline_errors, []
+
+    # the configuration names not found in the input
+    errors.extend(e for e in mapping.errors if e not in seen_errors)
+
+    return unique(errors), abouts
+
+
+def iter_abouts(inventory, scancode=False, reference_dir=None):
+    """
+    Yield tuples of (About object, list of errors) for each component mapping
+    of an `inventory` iterable.
 
+    A component with newline characters in a file field yields a tuple of
+    (None, list of newline errors). Once such an error is found the remaining
+    components are only checked for newlines and not hydrated.
+
+    The field names are validated once for all the components with the same
+    names and their errors are returned with the first of these components.
+    """
+    has_newline_errors = False
+    # {tuple of field names: FieldSchema}
+    schemas = {}
     for component in inventory:
+        newline_in_file_err = check_newline_in_file_field(component)
+        if newline_in_file_err:
+            has_newline_errors = True
+            yield None, newline_in_file_err
+            continue
+        if has_newline_errors:
+            continue
+
+        names = tuple(component)
+        schema = schemas.get(names)
+        schema_errors = []
+        if schema is None:
+            schema = schemas[names] = model.FieldSchema(names)
+            schema_errors = schema.errors
+
         about = model.About()
         ld_errors = about.load_dict(
             component,
             scancode=scancode,
             reference_dir=reference_dir,
+            schema=schema if schema.is_compiled else None,
         )
-        for e in ld_errors:
-            if not e in errors:
-                errors.extend(ld_errors)
-        abouts.append(about)
+        yield about, ld_errors + schema_errors
+
+
+# number of inventory components hydrated at once by a worker process
+HYDRATION_CHUNK_SIZE = 500
+
+
+def iter_abouts_in_processes(inventory, scancode=False, reference_dir=None, processes=2,
+                             chunk_size=HYDRATION_CHUNK_SIZE):
+    """
+    Yield tuples of (About object, list of errors) for each component mapping
+    of an `inventory` iterable like `iter_abouts` does. The components are
+    hydrated by chunks of `chunk_size` in a pool of `processes` processes and
+    the results are yielded in the `inventory` order.
+
+    Only a few chunks per process are read ahead from the `inventory`.
+    """
+    inventory = iter(inventory)
+    max_pending = processes * 2
+    pending = deque()
+    has_newline_errors = False
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(islice(inventory, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(
+                        _hydrate_chunk, chunk, scancode, reference_dir))
+                if not pending:
+                    break
+                for about, about_errors in pending.popleft().result():
+                    if about is None:
+                        has_newline_errors = True
+                    elif has_newline_errors:
+                        # like iter_abouts: nothing is returned once a newline
+                        # error is found but the newline errors
+                        continue
+                    yield about, about_errors
+        finally:
+            # do not wait for the chunks read ahead when the caller stops early
+            for future in pending:
+                future.cancel()
+
+
+def _hydrate_chunk(components, scancode, reference_dir):
+    """
+    Return a list of (About object, list of errors) for a `components` list
+    of component mappings. This runs in a worker process.
+    """
+    return list(iter_abouts(components, scancode, reference_dir))
 
-    return unique(errors), abouts
 
 def convert_object_to_dict(about):
     """
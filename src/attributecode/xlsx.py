@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import posixpath
+import re
+import zipfile
+
+from xml.etree.ElementTree import iterparse
+from xml.etree.ElementTree import parse
+
+"""
+A minimal reader for the values of the first sheet of an Excel .xlsx
+workbook. The workbook zip is read directly and the worksheet XML is parsed
+incrementally, without openpyxl.
+"""
+
+# built-in number formats ids that are dates or times
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(45, 48))
+
+WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+
+MAC_EPOCH = datetime.datetime(1904, 1, 1)
+
+# the literal and locale parts of a number format
+NUMBER_FORMAT_STRIP_RE = re.compile(r'"[^"]*"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+
+DATE_FORMAT_RE = re.compile(r'(?<![_\\])[dmhysDMHYS]')
+
+ESCAPED_CHARACTER_RE = re.compile(r'_x([0-9A-Fa-f]{4})_')
+
+# the string literals of a formula
+FORMULA_STRING_RE = re.compile(r'("(?:[^"]|"")*")')
+
+# the cell, columns and rows references of a formula
+FORMULA_REFERENCE_RE = re.compile(
+    r'(?<![\w.$])(?:'
+    r'(?P<cell>\$?[A-Za-z]{1,3}\$?[0-9]+)'
+    r'|(?P<columns>\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3})'
+    r'|(?P<rows>\$?[0-9]+:\$?[0-9]+)'
+    r')(?![\w(])'
+)
+
+CELL_REFERENCE_RE = re.compile(r'(\$?)([A-Za-z]+)(\$?)([0-9]+)')
+
+# the largest column and row numbers of a worksheet
+MAX_COLUMN = 16384
+MAX_ROW = 1048576
+
+
+def get_local_name(tag):
+    """
+    Return the name of an XML element `tag` without its namespace.
+    """
+    return tag.rpartition('}')[2]
+
+
+def iter_children(element, name):
+    for child in element:
+        if get_local_name(child.tag) == name:
+            yield child
+
+
+def get_attribute(element, name):
+    """
+    Return the value of the attribute `name` of an XML `element` ignoring the
+    attribute namespace or None.
+    """
+    for attribute, value in element.attrib.items():
+        if get_local_name(attribute) == name:
+            return value
+
+
+def iter_rows(location):
+    """
+    Yield a tuple of cell values for each row of the active sheet of the
+    .xlsx workbook at `location`, starting with the header row. Missing rows
+    are returned as empty tuples and missing cells as None.
+
+    The values are converted as openpyxl does: strings, integers, floats,
+    booleans and datetimes for the cells with a date number format.
+    """
+    with zipfile.ZipFile(location) as archive:
+        sheet_path, date1904 = get_active_sheet_path(archive)
+        shared_strings = get_shared_strings(archive)
+        date_styles = get_date_styles(archive)
+        epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+        with archive.open(sheet_path) as sheet:
+            # {shared formula index: (formula, cell reference)}
+            shared_formulas = {}
+            row_number = 0
+            sheet_data = None
+            for event, element in iterparse(sheet, events=('start', 'end')):
+                name = get_local_name(element.tag)
+                if event == 'start':
+                    if name == 'sheetData':
+                        sheet_data = element
+                    continue
+                if name != 'row':
+                    continue
+                current = int(element.get('r') or row_number + 1)
+                while row_number + 1 < current:
+                    row_number += 1
+                    yield ()
+                row_number = current
+                yield get_row_values(element, shared_strings, date_styles, epoch, shared_formulas)
+                # the processed rows are removed from the tree such that the
+                # memory used does not grow with the number of rows
+                element.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+
+def get_row_values(row, shared_strings, date_styles, epoch, shared_formulas=None):
+    """
+    Return a tuple of values for a `row` XML element.
+    """
+    values = []
+    for cell in iter_children(row, 'c'):
+        reference = cell.get('r')
+        if reference:
+            column = get_column_index(reference)
+        else:
+            column = len(values)
+        if column > len(values):
+            values.extend([None] * (column - len(values)))
+        values.append(get_cell_value(cell, shared_strings, date_styles, epoch, shared_formulas))
+    return tuple(values)
+
+
+def get_column_index(reference):
+    """
+    Return the zero-based column index of a cell `reference` such as "AB12".
+    """
+    index = 0
+    for character in reference:
+        if not character.isalpha():
+            break
+        index = index * 26 + ord(character.upper()) - ord('A') + 1
+    return index - 1
+
+
+def get_cell_value(cell, shared_strings, date_styles, epoch, shared_formulas=None):
+    """
+    Return the value of a `cell` XML element. The value of a formula cell is
+    its formula text starting with "=" as with openpyxl: the cached result of
+    the formula is not used.
+
+    The `shared_formulas` mapping collects the shared formulas of the
+    worksheet such that these can be translated for the cells that use them.
+    """
+    for formula in iter_children(cell, 'f'):
+        if shared_formulas is None:
+            shared_formulas = {}
+        return get_formula(formula, cell.get('r'), shared_formulas)
+
+    data_type = cell.get('t', 'n')
+    if data_type == 'inlineStr':
+        for inline_string in iter_children(cell, 'is'):
+            return get_string_text(inline_string)
+        return None
+
+    value = None
+    for value_element in iter_children(cell, 'v'):
+        value = value_element.text
+    if value is None:
+        return None
+
+    if data_type == 's':
+        return shared_strings[int(value)]
+    if data_type == 'b':
+        return value == '1'
+    if data_type in ('str', 'e', 'd'):
+        return value
+
+    if '.' in value or 'E' in value or 'e' in value:
+        value = float(value)
+    else:
+        value = int(value)
+    style = cell.get('s')
+    if style and int(style) in date_styles:
+        return from_excel(value, epoch)
+    return value
+
+
+def get_formula(formula, reference, shared_formulas):
+    """
+    Return the text starting with "=" of a `formula` XML element of the cell
+    at `reference`. A shared formula is translated from the cell where it is
+    defined.
+    """
+    text = formula.text or ''
+    if formula.get('t') == 'shared':
+        index = formula.get('si')
+        if index in shared_formulas:
+            shared_text, shared_reference = shared_formulas[index]
+            return translate_formula('=' + shared_text, shared_reference, reference)
+        if text:
+            shared_formulas[index] = text, reference
+    return '=' + text
+
+
+def translate_formula(formula, origin, destination):
+    """
+    Return a `formula` text of the cell at the `origin` reference translated
+    to the cell at the `destination` reference: the relative references are
+    moved by the rows and columns offsets between these two cells.
+    """
+    origin_column, origin_row = split_cell_reference(origin)
+    destination_column, destination_row = split_cell_reference(destination)
+    column_offset = destination_column - origin_column
+    row_offset = destination_row - origin_row
+
+    def translate_column(column):
+        absolute = column.startswith('$')
+        column = column.lstrip('$')
+        if absolute:
+            return '$' + column.upper()
+        index = get_column_index(column) + column_offset
+        if not 0 <= index < MAX_COLUMN:
+            raise ValueError(column)
+        return get_column_letter(index)
+
+    def translate_row(row):
+        absolute = row.startswith('$')
+        row = row.lstrip('$')
+        if absolute:
+            return '$' + row
+        number = int(row) + row_offset
+        if not 0 < number <= MAX_ROW:
+            raise ValueError(row)
+        return str(number)
+
+    def translate_reference(match):
+        try:
+            if match.group('cell'):
+                column_absolute, column, row_absolute, row = (
+                    CELL_REFERENCE_RE.match(match.group('cell')).groups())
+                return (translate_column(column_absolute + column)
+                        + translate_row(row_absolute + row))
+            if match.group('columns'):
+                return ':'.join(translate_column(c) for c in match.group('columns').split(':'))
+            return ':'.join(translate_row(r) for r in match.group('rows').split(':'))
+        except ValueError:
+            return '#REF!'
+
+    # the string literals are not translated
+    parts = FORMULA_STRING_RE.split(formula)
+    for index in range(0, len(parts), 2):
+        parts[index] = FORMULA_REFERENCE_RE.sub(translate_reference, parts[index])
+    return ''.join(parts)
+
+
+def split_cell_reference(reference):
+    """
+    Return a tuple of (zero-based column index, row number) for a cell
+    `reference` such as "AB12".
+    """
+    _, column, _, row = CELL_REFERENCE_RE.match(reference).groups()
+    return get_column_index(column), int(row)
+
+
+def get_column_letter(index):
+    """
+    Return the column letters of a zero-based column `index`.
+    """
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def get_string_text(element):
+    """
+    Return the plain text of a shared or inline string `element` ignoring the
+    phonetic runs.
+    """
+    texts = []
+    for child in element:
+        name = get_local_name(child.tag)
+        if name == 't':
+            texts.append(child.text or '')
+        elif name == 'r':
+            for text in iter_children(child, 't'):
+                texts.append(text.text or '')
+    text = ''.join(texts)
+    if '_x' in text:
+        text = ESCAPED_CHARACTER_RE.sub(lambda match: chr(int(match.group(1), 16)), text)
+    return text
+
+
+def from_excel(value, epoch=WINDOWS_EPOCH):
+    """
+    Return a datetime or time for an Excel serial date `value`.
+    """
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * 24 * 60 * 60 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.datetime.min + diff).time()
+    if 0 < value < 60 and epoch == WINDOWS_EPOCH:
+        # Excel wrongly considers 1900 as a leap year
+        day += 1
+    return epoch + datetime.timedelta(days=day) + diff
+
+
+def get_active_sheet_path(archive):
+    """
+    Return a tuple of (path of the active worksheet in the `archive`, True if
+    the workbook uses the 1904 date system).
+    """
+    workbook = parse(archive.open('xl/workbook.xml')).getroot()
+
+    date1904 = False
+    for properties in iter_children(workbook, 'workbookPr'):
+        date1904 = properties.get('date1904') in ('1', 'true')
+
+    active_tab = 0
+    for views in iter_children(workbook, 'bookViews'):
+        for view in iter_children(views, 'workbookView'):
+            active_tab = int(view.get('activeTab') or 0)
+            break
+
+    sheet_ids = []
+    for sheets in iter_children(workbook, 'sheets'):
+        for sheet in iter_children(sheets, 'sheet'):
+            sheet_ids.append(get_attribute(sheet, 'id'))
+    if not sheet_ids:
+        raise ValueError('No worksheet found in workbook.')
+    if active_tab >= len(sheet_ids):
+        active_tab = 0
+
+    relationships = parse(archive.open('xl/_rels/workbook.xml.rels')).getroot()
+    for relationship in iter_children(relationships, 'Relationship'):
+        if relationship.get('Id') == sheet_ids[active_tab]:
+            target = relationship.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/'), date1904
+            return posixpath.normpath(posixpath.join('xl', target)), date1904
+    raise ValueError('No worksheet found in workbook.')
+
+
+def get_shared_strings(archive):
+    """
+    Return the list of shared strings of the `archive`.
+    """
+    try:
+        shared_strings = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with shared_strings:
+        for _event, element in iterparse(shared_strings):
+            if get_local_name(element.tag) == 'si':
+                strings.append(get_string_text(element))
+                element.clear()
+    return strings
+
+
+def get_date_styles(archive):
+    """
+    Return the set of cell style indexes of the `archive` that have a date
+    number format.
+    """
+    try:
+        styles = parse(archive.open('xl/styles.xml')).getroot()
+    except KeyError:
+        return set()
+
+    date_formats = set(BUILTIN_DATE_FORMATS)
+    for number_formats in iter_children(styles, 'numFmts'):
+        for number_format in iter_children(number_formats, 'numFmt'):
+            format_code = number_format.get('formatCode') or ''
+            format_code = NUMBER_FORMAT_STRIP_RE.sub('', format_code.split(';')[0])
+            if DATE_FORMAT_RE.search(format_code):
+                date_formats.add(int(number_format.get('numFmtId')))
+
+    date_styles = set()
+    for cell_formats in iter_children(styles, 'cellXfs'):
+        for index, cell_format in enumerate(iter_children(cell_formats, 'xf')):
+            if int(cell_format.get('numFmtId') or 0) in date_formats:
+                date_styles.add(index)
+    return date_styles
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from attributecode import aggregate
+
+
+def mit(score, expression='mit'):
+    return {'key': 'mit', 'score': score, 'matched_rule': {'license_expression': expression}}
+
+
+def gpl(score):
+    return {'key': 'gpl-2.0', 'score': score, 'matched_rule': {'license_expression': 'gpl-2.0'}}
+
+
+RECORDS = [
+    {'path': 'project', 'type': 'directory', 'licenses': []},
+    {'path': 'project/vendor/lib/a.c', 'type': 'file', 'licenses': [mit(100.0)],
+     'copyrights': [{'value': 'Copyright A'}]},
+    {'path': 'project/vendor/lib/b.c', 'type': 'file', 'licenses': [mit(90.0), gpl(20.0)],
+     'copyrights': [{'value': 'Copyright A'}, {'value': 'Copyright B'}]},
+    {'path': 'project/vendor/lib/package.json', 'type': 'file', 'licenses': [],
+     'packages': [{'type': 'npm', 'name': 'lib', 'version': '1.0'}]},
+    {'path': 'project/main.c', 'type': 'file', 'licenses': [gpl(100.0)]},
+    {'path': 'setup.py', 'type': 'file', 'licenses': [gpl(100.0)], 'package_url': 'pkg:pypi/project@2.0'},
+]
+
+
+class AggregateTest(unittest.TestCase):
+
+    def test_aggregate_records_by_package(self):
+        result = aggregate.aggregate_records(RECORDS, 'package')
+        assert [('lib', '1.0', 'pkg:npm/lib@1.0', 3), ('main.c', None, None, 1), ('setup.py', None, None, 1)] == [
+            (r['name'], r.get('version'), r.get('package_url'), r['files_count']) for r in result]
+
+        lib = result[0]
+        assert 'project/vendor/lib' == lib['path']
+        assert [mit(100.0), gpl(20.0)] == lib['licenses']
+        assert [{'value': 'Copyright A'}, {'value': 'Copyright B'}] == lib['copyrights']
+
+    def test_aggregate_records_by_directory(self):
+        result = aggregate.aggregate_records(RECORDS, 'directory')
+        assert [('project', 4), ('setup.py', 1)] == [(r['path'], r['files_count']) for r in result]
+
+        result = aggregate.aggregate_records(RECORDS, 'directory', depth=3)
+        assert ['project/vendor/lib', 'project', 'setup.py'] == [r['path'] for r in result]
+
+    def test_aggregate_records_by_package_url(self):
+        result = aggregate.aggregate_records(RECORDS, 'package_url')
+        assert ('project', '2.0') == (result[-1]['name'], result[-1]['version'])
+        assert 'pkg:npm/lib@1.0' == result[2]['package_url']
+        assert 5 == len(result)
+
+    def test_aggregate_records_with_min_license_score(self):
+        result = aggregate.aggregate_records(RECORDS, 'package', min_license_score=50)
+        assert [mit(100.0)] == result[0]['licenses']
+
+        result = aggregate.aggregate_records(RECORDS, 'directory', min_license_score=101)
+        assert [] == result
+
+    def test_aggregate_records_in_processes(self):
+        expected = aggregate.aggregate_records(RECORDS, 'package')
+        result = aggregate.aggregate_records(RECORDS, 'package', processes=2)
+        assert expected == result
+
+    def test_merge_license_detections_keeps_each_matched_rule(self):
+        records = [{'licenses': [mit(50.0, 'mit OR apache-2.0')]}, {'licenses': [mit(70.0), mit(60.0)]}]
+        result = aggregate.merge_license_detections(records)
+        assert [mit(50.0, 'mit OR apache-2.0'), mit(70.0)] == result
+
+    def test_group_records_with_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            aggregate.group_records(RECORDS, 'unknown')
@@ -72,6 +72,66 @@ class TemplateTest(unittest.TestCase):
             except:
                 raise Exception(template_loc)
 
+    def test_get_template_field_names(self):
+        template = '''
+            {% for about in abouts | sort(attribute='name') %}
+                {{ about.name.value }} {{ about['version'].value }}
+                {% set glob = {} %}
+                {% for lic in about.licenses.value %}{{ glob[lic.key] }}{% endfor %}
+            {% endfor %}'''
+        result = attrib.get_template_field_names(template)
+        assert set(['name', 'version', 'value', 'licenses', 'key']) <= result
+        assert 'copyrights' not in result
+
+    def test_get_template_field_names_returns_None_for_dynamic_field_access(self):
+        templates = [
+            '{% for about in abouts %}{{ about[variables.field] }}{% endfor %}',
+            '{% for about in abouts %}{% for k, v in about.items() %}{{ k }}{% endfor %}{% endfor %}',
+            '{% for group in abouts | groupby("name") %}{% for about in group.list %}'
+            '{{ about | tojson }}{% endfor %}{% endfor %}',
+            '{% for about in abouts %}{% for f in about.all_fields() %}{{ f.name }}{% endfor %}{% endfor %}',
+            '{% for about in abouts %}{% for f in about.custom_fields %}{{ f }}{% endfor %}{% endfor %}',
+            '{% for about in abouts %}{{ about.fields }}{% endfor %}',
+            '{{ template_string',
+        ]
+        for template in templates:
+            assert None == attrib.get_template_field_names(template), template
+
+    def test_get_template_field_names_returns_None_for_whole_about_access(self):
+        templates = [
+            '{% for about in abouts %}{{ about }}{% endfor %}',
+            '{% for about_object in abouts %}{% set about = about_object %}{{ about }}{% endfor %}',
+            '{{ abouts | first }}',
+            '{% for about in abouts | sort(attribute="name") %}{{ about | string }}{% endfor %}',
+            '{% macro show(about) %}{{ about.name.value }}{% endmacro %}'
+            '{% for about in abouts %}{{ show(about) }}{% endfor %}',
+            '{% for about in abouts %}{{ render_about(about=about) }}{% endfor %}',
+            '{% for group in abouts | groupby("name") %}{% for about in group.list %}'
+            '{{ [about] }}{% endfor %}{% endfor %}',
+        ]
+        for template in templates:
+            assert None == attrib.get_template_field_names(template), template
+
+    def test_get_template_field_names_with_about_tests_and_scalar_filters(self):
+        template = '''
+            {{ abouts | length }}
+            {% for about in abouts if about is defined %}
+                {% if about %}{{ about.name.value }}{% endif %}
+                {% set comp = about.name.value %}{{ comp }} {{ [comp] }}
+            {% endfor %}'''
+        result = attrib.get_template_field_names(template)
+        assert set(['name', 'value']) <= result
+
+    def test_get_template_field_names_from_builtin_templates(self):
+        builtin_templates_dir = os.path.dirname(attrib.DEFAULT_TEMPLATE_FILE)
+        for template in os.listdir(builtin_templates_dir):
+            if not template.endswith('.template'):
+                continue
+            template_loc = os.path.join(builtin_templates_dir, template)
+            result = attrib.get_template_field_names_from_file(template_loc)
+            assert result is not None, template_loc
+            assert 'name' in result
+
 
 class GenerateTest(unittest.TestCase):
 
@@ -91,6 +151,25 @@ class GenerateTest(unittest.TestCase):
         error, result = attrib.generate_from_file(abouts, lic_dict, min_license_score=0, template_loc=custom_template)
         assert not error
 
+        # only loading the fields used by the template renders the same text
+        keep_fields = attrib.get_template_field_names_from_file(custom_template)
+        errors, projected_abouts = util.load_inventory(test_file, scancode=True, keep_fields=keep_fields)
+        assert not errors
+        error, projected_result = attrib.generate_from_file(
+            projected_abouts, lic_dict, min_license_score=0, template_loc=custom_template)
+        assert not error
+        assert remove_timestamp(result) == remove_timestamp(projected_result)
+
+        # pruning the detections below the score at load time renders the same text
+        error, result = attrib.generate_from_file(abouts, lic_dict, min_license_score=90, template_loc=custom_template)
+        assert not error
+        errors, pruned_abouts = util.load_inventory(test_file, scancode=True, min_license_score=90)
+        assert not errors
+        error, pruned_result = attrib.generate_from_file(
+            pruned_abouts, lic_dict, min_license_score=90, template_loc=custom_template)
+        assert not error
+        assert remove_timestamp(result) == remove_timestamp(pruned_result)
+
         expected_file = get_test_loc(
             'test_attrib/scancode_custom_template/expect.html')
         with open(expected_file) as exp:
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import unittest
+
+from testing_utils import get_temp_dir
+
+from attributecode import ERROR
+from attributecode import Error
+from attributecode.cache import LicenseCache
+
+
+class LicenseCacheTest(unittest.TestCase):
+
+    def test_LicenseCache_get_returns_None_for_missing_entry(self):
+        cache = LicenseCache(get_temp_dir())
+        assert cache.get('https://example.com/', 'mit') is None
+
+    def test_LicenseCache_put_and_get(self):
+        cache = LicenseCache(get_temp_dir())
+        license_data = {'key': 'mit', 'license_text': 'Permission is hereby granted'}
+        cache.put('https://example.com/', 'mit', license_data)
+        assert cache.get('https://example.com/', 'mit') == license_data
+
+    def test_LicenseCache_entries_are_keyed_by_url_and_license_key(self):
+        cache = LicenseCache(get_temp_dir())
+        cache.put('https://example.com/', 'mit', {'key': 'mit'})
+        assert cache.get('https://example.org/', 'mit') is None
+        assert cache.get('https://example.com/', 'apache-2.0') is None
+
+    def test_LicenseCache_can_be_shared(self):
+        location = get_temp_dir()
+        LicenseCache(location).put('https://example.com/', 'mit', {'key': 'mit'})
+        assert LicenseCache(location).get('https://example.com/', 'mit') == {'key': 'mit'}
+
+    def test_LicenseCache_get_ignores_expired_entries(self):
+        cache = LicenseCache(get_temp_dir(), ttl=0)
+        cache.put('https://example.com/', 'mit', {'key': 'mit'})
+        time.sleep(0.01)
+        assert cache.get('https://example.com/', 'mit') is None
+        assert not os.path.exists(cache.get_location('https://example.com/', 'mit'))
+
+    def test_LicenseCache_evict_removes_least_recently_used_entries(self):
+        cache = LicenseCache(get_temp_dir())
+        cache.put('https://example.com/', 'mit', {'key': 'mit'})
+        cache.put('https://example.com/', 'isc', {'key': 'isc'})
+        mit_location = cache.get_location('https://example.com/', 'mit')
+        isc_location = cache.get_location('https://example.com/', 'isc')
+        now = time.time()
+        os.utime(mit_location, (now - 10, now - 10))
+        cache.max_size = os.path.getsize(isc_location)
+
+        cache.evict()
+        assert cache.get('https://example.com/', 'mit') is None
+        assert cache.get('https://example.com/', 'isc') == {'key': 'isc'}
+
+    def test_LicenseCache_clear(self):
+        cache = LicenseCache(get_temp_dir())
+        cache.put('https://example.com/', 'mit', {'key': 'mit'})
+        cache.clear()
+        assert list(cache.iter_entries()) == []
+
+    def test_LicenseCache_put_missing_and_get_missing(self):
+        cache = LicenseCache(get_temp_dir())
+        errors = [Error(ERROR, "Invalid 'license': commercial-acme", kind='invalid-license-key')]
+        cache.put_missing('https://example.com/', 'commercial-acme', errors)
+        assert cache.get_missing('https://example.com/', 'commercial-acme') == errors
+        assert cache.get_missing('https://example.com/', 'commercial-acme')[0].kind == 'invalid-license-key'
+        assert cache.get('https://example.com/', 'commercial-acme') is None
+        assert cache.get_missing('https://example.com/', 'mit') is None
+
+    def test_LicenseCache_get_source_key_includes_a_hash_of_the_api_key(self):
+        cache = LicenseCache(get_temp_dir())
+        url = 'https://djc.example.com/api/v2/licenses/'
+        assert cache.get_source_key(url) == url
+        key1 = cache.get_source_key(url, 'key1')
+        assert key1 == cache.get_source_key(url, 'key1')
+        assert key1 != cache.get_source_key(url, 'key2')
+        assert 'key1' not in key1
+
+        cache.put(key1, 'mit', {'key': 'mit'})
+        assert cache.get(key1, 'mit') == {'key': 'mit'}
+        assert cache.get(cache.get_source_key(url, 'key2'), 'mit') is None
+
+    def test_LicenseCache_missing_entries_have_their_own_ttl(self):
+        cache = LicenseCache(get_temp_dir(), negative_ttl=0)
+        cache.put('https://example.com/', 'mit', {'key': 'mit'})
+        cache.put_missing('https://example.com/', 'commercial-acme', [])
+        time.sleep(0.01)
+        assert cache.get_missing('https://example.com/', 'commercial-acme') is None
+        assert cache.get('https://example.com/', 'mit') == {'key': 'mit'}
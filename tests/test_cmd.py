@@ -19,6 +19,8 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import io
+import json
+import os
 import unittest
 
 from attributecode import CRITICAL
@@ -27,8 +29,11 @@ from attributecode import ERROR
 from attributecode import INFO
 from attributecode import NOTSET
 from attributecode import WARNING
+from attributecode import attrib
 from attributecode import cmd
 from attributecode import Error
+from attributecode.util import filter_errors
+from attributecode.util import get_file_text
 
 from testing_utils import run_about_command_test_click
 from testing_utils import get_test_loc
@@ -208,6 +213,35 @@ def test_get_error_messages():
     assert expected == emsgs
 
 
+def test_get_error_messages_aggregates_errors_of_the_same_kind():
+    reference = get_temp_dir()
+    errors = [get_file_text('missing-%d.LICENSE' % i, reference)[0] for i in range(100)]
+    errors.append(Error(ERROR, 'msg1'))
+
+    emsgs, ec = cmd.get_error_messages(errors)
+    assert 101 == ec
+    expected = ['Command completed with 101 errors or warnings.']
+    expected.extend(
+        'CRITICAL: The file %s does not exist' % os.path.join(reference, 'missing-%d.LICENSE' % i)
+        for i in range(5))
+    expected.extend([
+        'CRITICAL: 95 more errors of the kind "missing-file" are not reported. '
+        'Use --verbose to report all the errors.',
+        'ERROR: msg1',
+    ])
+    assert expected == emsgs
+
+
+def test_get_error_messages_verbose_reports_all_errors_of_the_same_kind():
+    reference = get_temp_dir()
+    errors = [get_file_text('missing-%d.LICENSE' % i, reference)[0] for i in range(100)]
+
+    emsgs, ec = cmd.get_error_messages(errors, verbose=True)
+    assert 100 == ec
+    assert 101 == len(emsgs)
+    assert emsgs[-1] == 'CRITICAL: The file %s does not exist' % os.path.join(reference, 'missing-99.LICENSE')
+
+
 def test_get_error_messages_quiet():
     errors = [
         Error(CRITICAL, 'msg1'),
@@ -262,7 +296,7 @@ class TestFilterError(unittest.TestCase):
             Error(ERROR, 'msg2'),
             Error(WARNING, 'msg4'),
         ]
-        assert expected == cmd.filter_errors(errors)
+        assert expected == filter_errors(errors)
 
 
     def test_filter_errors_with_min(self):
@@ -277,7 +311,7 @@ class TestFilterError(unittest.TestCase):
         expected = [
             Error(CRITICAL, 'msg1'),
         ]
-        assert expected == cmd.filter_errors(errors, CRITICAL)
+        assert expected == filter_errors(errors, CRITICAL)
 
 
     def test_filter_errors_no_errors(self):
@@ -286,11 +320,11 @@ class TestFilterError(unittest.TestCase):
             Error(DEBUG, 'msg4'),
             Error(NOTSET, 'msg4'),
         ]
-        assert [] == cmd.filter_errors(errors)
+        assert [] == filter_errors(errors)
 
 
     def test_filter_errors_none(self):
-        assert [] == cmd.filter_errors([])
+        assert [] == filter_errors([])
 
 
 class TestParseKeyValues(unittest.TestCase):
@@ -358,6 +392,62 @@ def check_about_stdout(options, expected_loc, regen=False):
     assert expected.splitlines(False) == result.output.splitlines(False)
 
 
+def run_scancode_attribution(options):
+    """
+    Run the attribution of a scan of three files with license scores of 100,
+    80 and none with an offline LicenseDB mirror and the `options` list of
+    options. Return the generated attribution.
+    """
+    mirror = get_temp_dir()
+    for key in ('mit', 'gpl-2.0'):
+        with io.open(os.path.join(mirror, key + '.json'), 'w') as license_data:
+            license_data.write(json.dumps({'key': key}))
+        with io.open(os.path.join(mirror, key + '.LICENSE'), 'w') as license_text:
+            license_text.write(key + ' text')
+
+    output = get_temp_file('attribution.html')
+    test_file = get_test_loc('test_cmd/scancode_scores.json')
+    run_about_command_test_click(
+        ['--scancode', '--offline', mirror, '--no-cache'] + options + [test_file, output])
+    with io.open(output, encoding='utf-8') as attribution:
+        return attribution.read()
+
+
+def test_scancode_with_default_template_keeps_files_below_default_score():
+    result = run_scancode_attribution([])
+    for name in ('a.c', 'b.c', 'c.c'):
+        assert '<h3 class="component-name">' + name in result
+    assert 'gpl-2.0 text' in result
+
+
+def test_scancode_with_min_license_score_skips_files_below_score():
+    result = run_scancode_attribution(['--min-license-score', '90'])
+    assert '<h3 class="component-name">a.c' in result
+    assert 'b.c' not in result
+    assert 'c.c' not in result
+    assert 'gpl-2.0 text' not in result
+
+
+def test_scancode_aggregated_with_default_template_keeps_groups_below_default_score():
+    result = run_scancode_attribution(['--aggregate-by', 'package_url'])
+    for name in ('a.c', 'b.c', 'c.c'):
+        assert '<h3 class="component-name">' + name in result
+
+    result = run_scancode_attribution(['--aggregate-by', 'package_url', '--min-license-score', '90'])
+    assert '<h3 class="component-name">a.c' in result
+    assert 'b.c' not in result
+    assert 'c.c' not in result
+
+
+def test_get_load_license_score():
+    scancode_template = os.path.join(
+        os.path.dirname(attrib.DEFAULT_TEMPLATE_FILE), 'scancode.template')
+    assert None == cmd.get_load_license_score(None, True, attrib.DEFAULT_TEMPLATE_FILE)
+    assert 40 == cmd.get_load_license_score(40, True, attrib.DEFAULT_TEMPLATE_FILE)
+    assert 100 == cmd.get_load_license_score(None, True, scancode_template)
+    assert None == cmd.get_load_license_score(None, False, scancode_template)
+
+
 def test_about_help_text():
     check_about_stdout(['--help'], 'test_cmd/help/about_help.txt', regen=False)
 
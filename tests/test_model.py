@@ -22,9 +22,11 @@ from collections import OrderedDict
 import io
 import json
 import os
+import pickle
 import posixpath
 import shutil
 import unittest
+from urllib.error import HTTPError
 
 import mock
 
@@ -33,8 +35,11 @@ from attributecode import ERROR
 from attributecode import INFO
 from attributecode import WARNING
 from attributecode import Error
+from attributecode import api
 from attributecode import model
-from attributecode.util import add_unc, on_windows, is_online
+from attributecode.cache import LicenseCache
+from attributecode.util import ErrorBudget
+from attributecode.util import add_unc, on_windows
 from attributecode.util import load_csv
 from attributecode.util import to_posix
 
@@ -108,6 +113,22 @@ class FieldTest(unittest.TestCase):
         field = model.Field()
         assert not field.has_content
 
+    def test_Field_original_value_is_a_string(self):
+        licenses = [{'key': 'mit', 'score': 100.0}]
+        field = model.Field(name='licenses', value=licenses)
+        assert field.has_content
+        assert repr(licenses) == field.original_value
+        assert licenses is field.value
+
+        field = model.Field(name='name', value='cryptohash')
+        assert 'cryptohash' == field.original_value
+
+    def test_Field_does_not_repr_its_value_unless_requested(self):
+        with mock.patch('attributecode.model.repr', create=True) as mock_repr:
+            field = model.Field(name='licenses', value=[{'key': 'mit'}])
+            assert field.has_content
+            assert not mock_repr.called
+
     def test_empty_Field_has_default_value(self):
         field = model.Field()
         assert '' == field.value
@@ -123,6 +144,80 @@ class FieldTest(unittest.TestCase):
             assert expected_errors == errors
             assert expected == field.value
 
+class AboutTest(unittest.TestCase):
+
+    def test_About_fields_are_attributes(self):
+        about = model.About()
+        errors = about.load_dict(OrderedDict([
+            ('name', 'cryptohash'), ('version', '0.11'), ('owner', 'nexB')]))
+        assert errors == []
+        assert about.name is about.fields['name']
+        assert about.name.value == 'cryptohash'
+        assert about.owner is about.custom_fields['owner']
+        assert about.owner.value == 'nexB'
+        assert not hasattr(about, 'unknown_field')
+
+    def test_About_and_Field_have_no_instance_dict(self):
+        about = model.About()
+        assert not hasattr(about, '__dict__')
+        assert not hasattr(about.name, '__dict__')
+
+    def test_About_hydrate_reports_custom_fields_conflicting_with_attributes(self):
+        about = model.About()
+        errors = about.hydrate([('errors', 'some')])
+        expected = [Error(CRITICAL, "Internal error with custom field: 'errors': 'some'.")]
+        assert expected == errors
+
+    def test_About_can_be_pickled(self):
+        about = model.About()
+        about.load_dict(OrderedDict([('name', 'cryptohash'), ('owner', 'nexB')]))
+        result = pickle.loads(pickle.dumps(about))
+        assert result.name.value == 'cryptohash'
+        assert result.owner.value == 'nexB'
+        assert repr(about) == repr(result)
+
+
+class FieldSchemaTest(unittest.TestCase):
+
+    def check_schema_parity(self, fields):
+        expected_about = model.About()
+        expected_errors = expected_about.hydrate(fields)
+
+        schema = model.FieldSchema([name for name, _ in fields])
+        assert schema.is_compiled
+        about = model.About()
+        errors = about.process(fields, schema=schema)
+        # the schema errors are reported separately from the row errors
+        assert sorted(expected_errors) == sorted(errors + schema.errors)
+        assert repr(expected_about) == repr(about)
+
+    def test_FieldSchema_hydrate_has_parity_with_About_hydrate(self):
+        self.check_schema_parity([
+            ('Name', 'cryptohash'),
+            ('version', ''),
+            ('owner', 'nexB'),
+            ('Home Page', 'https://example.com'),
+            ('errors', 'some'),
+        ])
+
+    def test_FieldSchema_reports_header_errors_once(self):
+        schema = model.FieldSchema(['name', 'Home Page'])
+        expected = [Error(INFO, "Field name: 'home page' is ignored as it contains illegal name characters.")]
+        assert expected == schema.errors
+        about = model.About()
+        assert [] == about.process([('name', 'a'), ('Home Page', 'b')], schema=schema)
+        assert 'home page' not in about.custom_fields
+
+    def test_FieldSchema_is_not_compiled_with_duplicated_names(self):
+        schema = model.FieldSchema(['name', 'Name'])
+        assert not schema.is_compiled
+        assert [] == schema.errors
+
+    def test_FieldSchema_is_not_compiled_with_missing_names(self):
+        schema = model.FieldSchema(['name', None])
+        assert not schema.is_compiled
+
+
 class CollectorTest(unittest.TestCase):
 
     def test_parse_license_expression(self):
@@ -139,19 +234,327 @@ class CollectorTest(unittest.TestCase):
         assert expected_lic == returned_lic
         assert expected_spec_char == spec_char
 
-class FetchLicenseTest(unittest.TestCase):
+    def test_parse_license_expression_returns_new_lists(self):
+        _, lic_list = model.parse_license_expression('mit or isc')
+        lic_list.append('gpl-2.0')
+        _, lic_list = model.parse_license_expression('mit or isc')
+        assert ['mit', 'isc'] == lic_list
+
+    def test_parse_license_expression_is_memoized(self):
+        model._parse_license_expression.cache_clear()
+        with mock.patch.object(model.licensing, 'license_keys', return_value=['bsd-new']) as license_keys:
+            for _ in range(3):
+                assert ([], ['bsd-new']) == model.parse_license_expression('bsd-new')
+        assert 1 == license_keys.call_count
+        model._parse_license_expression.cache_clear()
+
+    def test_detect_special_char_keeps_the_reference_order(self):
+        assert ['@', '&', '\\', ','] == model.detect_special_char(', \\ & mit@ &')
+        assert [] == model.detect_special_char('mit or apache-2.0')
+
+class LicenseFetchPlanTest(unittest.TestCase):
+
+    def test_plan_license_fetch_dedupes_license_keys(self):
+        about1 = model.About()
+        about1.license_expression.value = 'mit or apache-2.0'
+        about2 = model.About()
+        about2.license_expression.value = 'apache-2.0 and mit and isc'
+        about3 = model.About()
+        plan = model.plan_license_fetch([about1, about2, about3], scancode=False)
+        assert plan.license_keys == ['mit', 'apache-2.0', 'isc']
+        assert plan.errors == []
+
+    def test_plan_license_fetch_records_license_file_fallbacks(self):
+        about1 = model.About()
+        about1.license_expression.value = 'custom'
+        about2 = model.About()
+        about2.license_expression.value = 'custom and mit'
+        about2.license_file.value = 'custom.LICENSE'
+        about3 = model.About()
+        about3.license_expression.value = 'custom'
+        about3.license_file.value = 'custom.LICENSE'
+        plan = model.plan_license_fetch([about1, about2, about3], scancode=False)
+        assert plan.get_fallback_abouts('custom') == [about2]
+        assert plan.get_fallback_abouts('mit') == [about2]
+        assert plan.get_fallback_abouts('unknown') == []
+
+    def test_plan_license_fetch_with_scancode(self):
+        about = model.About()
+        about.hydrate([('licenses', [{'key': 'mit'}, {'key': 'isc'}, {'key': 'mit'}])])
+        plan = model.plan_license_fetch([about], scancode=True)
+        assert plan.license_keys == ['mit', 'isc']
+
+    def test_plan_license_fetch_reports_special_characters(self):
+        about = model.About()
+        about.license_expression.value = 'mit, isc'
+        plan = model.plan_license_fetch([about], scancode=False)
+        assert len(plan) == 0
+        expected = [Error(ERROR, "The following character(s) cannot be in the license_expression: [',']")]
+        assert plan.errors == expected
 
-    @mock.patch('attributecode.util.is_online')
-    def test_pre_process_and_fetch_license_dict(self, is_online):
-        is_online.return_value = False
-        licensedb_url = 'https://scancode-licensedb.aboutcode.org/'
-        error_msg = (
-            'Network problem. Please check your Internet connection. '
-            'License fetching is skipped.')
-        expected = ({}, [Error(ERROR, error_msg)])
-        assert model.pre_process_and_fetch_license_dict([], None, False) == expected
 
-        is_online.return_value = True
+class FetchLicenseTest(unittest.TestCase):
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict(self, http_get):
+        http_get.side_effect = OSError('Network is unreachable')
         expected = ({}, [])
         assert model.pre_process_and_fetch_license_dict([], None, False) == expected
+        # there is no connectivity check without licenses to fetch
+        assert not http_get.called
+
+        about = model.About()
+        about.license_expression.value = 'mit and apache-2.0'
+        expected = ({}, [api.NETWORK_ERROR])
+        assert model.pre_process_and_fetch_license_dict([about], None, False) == expected
+
+    def test_pre_process_and_fetch_license_dict_uses_cache(self):
+        licensedb_url = 'https://scancode-licensedb.aboutcode.org/'
+        cache = LicenseCache(get_temp_dir())
+        license_data = {'key': 'mit', 'license_text': 'Permission is hereby granted'}
+        cache.put(licensedb_url, 'mit', license_data)
+
+        about = model.About()
+        about.license_expression.value = 'mit'
+        result = model.pre_process_and_fetch_license_dict([about], None, False, cache=cache)
+        assert result == ({'mit': license_data}, [])
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_fetches_licenses_concurrently(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+
+        about1 = model.About()
+        about1.license_expression.value = 'mit or apache-2.0'
+        about2 = model.About()
+        about2.license_expression.value = 'mit and isc'
+        result, errors = model.pre_process_and_fetch_license_dict(
+            [about1, about2], None, False, workers=3)
+        assert errors == []
+        assert sorted(result) == ['apache-2.0', 'isc', 'mit']
+        assert result['isc'] == {'key': 'isc', 'license_text': 'isc text'}
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_uses_license_file_for_unknown_key(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+        reference = get_temp_dir()
+        with io.open(os.path.join(reference, 'custom.LICENSE'), 'w', encoding='utf-8') as lf:
+            lf.write('custom license text')
+
+        about = model.About()
+        about.license_expression.value = 'mit and unknown-custom'
+        about.license_file.value = 'custom.LICENSE'
+        result, errors = model.pre_process_and_fetch_license_dict([about], None, False, reference)
+        assert errors == []
+        assert result['unknown-custom'] == {'key': 'unknown-custom', 'license_text': 'custom license text'}
+
+        about.license_file.value = ''
+        result, errors = model.pre_process_and_fetch_license_dict([about], None, False, reference)
+        expected = Error(ERROR,
+            'The following URL is not reachable: \n'
+            'https://scancode-licensedb.aboutcode.org/unknown-custom.json\n')
+        assert errors == [expected]
+        assert sorted(result) == ['mit']
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_caches_unknown_keys(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+        cache = LicenseCache(get_temp_dir())
+        about = model.About()
+        about.license_expression.value = 'mit and commercial-acme'
+
+        expected = model.pre_process_and_fetch_license_dict([about], None, False, cache=cache)
+        assert len(expected[1]) == 1
+        http_get.reset_mock()
+        result = model.pre_process_and_fetch_license_dict([about], None, False, cache=cache)
+        assert result == expected
+        assert not http_get.called
+
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_stops_when_error_budget_is_exceeded(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+        about = model.About()
+        about.license_expression.value = 'unknown-1 and unknown-2 and unknown-3 and unknown-4'
+
+        budget = ErrorBudget(max_errors=1)
+        result, errors = model.pre_process_and_fetch_license_dict(
+            [about], None, False, workers=1, budget=budget)
+        assert result == {}
+        assert budget.is_exceeded
+        assert len(errors) == 2
+        assert 'unknown-2' in errors[1].message
+
+
+def fake_licensedb_get(url, headers=None, timeout=None):
+    """
+    Return a file-like object for a LicenseDB `url`, raising an HTTPError for
+    unknown license keys.
+    """
+    base_url, _, file_name = url.rpartition('/')
+    if file_name == 'index.json':
+        index = [{'license_key': key, 'json': key + '.json', 'license': key + '.LICENSE'}
+                 for key in ('mit', 'apache-2.0', 'isc')]
+        return io.BytesIO(json.dumps(index).encode('utf-8'))
+    key, _, extension = file_name.rpartition('.')
+    if key not in ('mit', 'apache-2.0', 'isc'):
+        raise HTTPError(url, 404, 'Not Found', {}, None)
+    if extension == 'json':
+        return io.BytesIO(json.dumps({'key': key}).encode('utf-8'))
+    return io.BytesIO((key + ' text').encode('utf-8'))
+
+
+class OfflineLicenseDBTest(unittest.TestCase):
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_mirror_licensedb(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+        location = get_temp_dir()
+        license_count, errors = model.mirror_licensedb(location)
+        assert errors == []
+        assert license_count == 3
+        expected = [
+            'apache-2.0.LICENSE', 'apache-2.0.json', 'index.json',
+            'isc.LICENSE', 'isc.json', 'mit.LICENSE', 'mit.json']
+        assert sorted(os.listdir(location)) == expected
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_mirror_licensedb_does_not_write_outside_of_the_mirror(self, http_get):
+        index = [
+            {'license_key': 'mit', 'json': '../../mit.json', 'license': 'mit.LICENSE'},
+            {'license_key': '../isc'},
+        ]
+
+        def fake_get(url, headers=None, timeout=None):
+            if url.endswith('index.json'):
+                return io.BytesIO(json.dumps(index).encode('utf-8'))
+            return io.BytesIO(b'text')
+
+        http_get.side_effect = fake_get
+        parent = get_temp_dir()
+        location = os.path.join(parent, 'mirror', 'licenses')
+        license_count, errors = model.mirror_licensedb(location)
+        assert license_count == 2
+        assert [e.message for e in errors] == [
+            "Invalid file name in the LicenseDB index: '../../mit.json'",
+            "Invalid file name in the LicenseDB index: '../isc.json'",
+            "Invalid file name in the LicenseDB index: '../isc.LICENSE'",
+        ]
+        assert sorted(os.listdir(location)) == ['index.json', 'mit.LICENSE']
+        assert sorted(os.listdir(parent)) == ['mirror']
+        assert os.listdir(os.path.join(parent, 'mirror')) == ['licenses']
+
+    def test_is_plain_file_name(self):
+        assert model.is_plain_file_name('mit.LICENSE')
+        for file_name in ('', '..', '../mit.json', 'a/b.json', 'a\\b.json', 'c:mit.json'):
+            assert not model.is_plain_file_name(file_name), file_name
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_offline(self, http_get):
+        http_get.side_effect = fake_licensedb_get
+        location = get_temp_dir()
+        model.mirror_licensedb(location)
+
+        http_get.side_effect = Exception('No network access in offline mode')
+        about = model.About()
+        about.license_expression.value = 'mit and unknown-custom'
+        result, errors = model.pre_process_and_fetch_license_dict(
+            [about], None, False, offline=location)
+        assert result == {'mit': {'key': 'mit', 'license_text': 'mit text'}}
+        expected = Error(ERROR,
+            'The following license files do not exist: \n' +
+            os.path.join(location, 'unknown-custom.json') + '\n' +
+            os.path.join(location, 'unknown-custom.LICENSE'))
+        assert errors == [expected]
+
+
+class DejaCodeBatchTest(unittest.TestCase):
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_fetch_dejacode_licenses_queries_keys_in_batch(self, http_get):
+        pages = {
+            1: {'count': 3, 'next': 'https://djc.example.com/api/v2/licenses/?page=2',
+                'results': [{'key': 'mit', 'full_text': 'mit text'}, {'key': 'isc', 'full_text': 'isc text'}]},
+            2: {'count': 3, 'next': None,
+                'results': [{'key': 'apache-2.0', 'full_text': 'apache text'}]},
+        }
+
+        def fake_get(url, headers=None, timeout=None):
+            page = 2 if 'page=2' in url else 1
+            return io.BytesIO(json.dumps(pages[page]).encode('utf-8'))
+
+        http_get.side_effect = fake_get
+        results = model.fetch_dejacode_licenses(
+            'https://djc.example.com/api/v2/licenses/', 'key',
+            ['mit', 'apache-2.0', 'isc', 'commercial-acme'])
+
+        assert http_get.call_count == 2
+        first_url = http_get.call_args_list[0][0][0]
+        assert 'key=mit&key=apache-2.0&key=isc&key=commercial-acme' in first_url
+        assert results['apache-2.0'] == (
+            {'key': 'apache-2.0', 'full_text': 'apache text', 'license_text': 'apache text'}, False, [])
+        invalid = Error(ERROR, "Invalid 'license': commercial-acme")
+        assert results['commercial-acme'] == ({}, True, [invalid])
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_does_not_share_cache_between_api_keys(self, http_get):
+        djc_url = 'https://djc.example.com/api/v2/licenses/'
+        licenses = {'mit': {'key': 'mit', 'full_text': 'mit text'}}
+
+        def fake_get(url, headers=None, timeout=None):
+            # only the first API key has access to the mit license
+            results = [licenses['mit']] if headers['Authorization'] == 'Token key1' else []
+            return io.BytesIO(json.dumps({'count': len(results), 'next': None, 'results': results}).encode('utf-8'))
+
+        http_get.side_effect = fake_get
+        cache = LicenseCache(get_temp_dir())
+        about = model.About()
+        about.license_expression.value = 'mit'
+
+        result, errors = model.pre_process_and_fetch_license_dict([about], (djc_url, 'key1'), False, cache=cache)
+        assert sorted(result) == ['mit']
+        result, errors = model.pre_process_and_fetch_license_dict([about], (djc_url, 'key2'), False, cache=cache)
+        assert result == {}
+        assert errors == [Error(ERROR, "Invalid 'license': mit")]
+        assert http_get.call_count == 2
+
+        # each API key reuses its own positive or negative cache entry
+        http_get.reset_mock()
+        result, _ = model.pre_process_and_fetch_license_dict([about], (djc_url, 'key1'), False, cache=cache)
+        assert sorted(result) == ['mit']
+        result, errors = model.pre_process_and_fetch_license_dict([about], (djc_url, 'key2'), False, cache=cache)
+        assert result == {}
+        assert errors == [Error(ERROR, "Invalid 'license': mit")]
+        assert not http_get.called
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_fetch_dejacode_licenses_with_invalid_api_key(self, http_get):
+        http_get.side_effect = HTTPError('https://djc.example.com/', 403, 'Forbidden', {}, None)
+        results = model.fetch_dejacode_licenses('https://djc.example.com/', 'key', ['mit', 'isc'])
+        assert results['mit'] == ({}, False, [api.AUTH_ERROR])
+        assert results['isc'] == ({}, False, [api.AUTH_ERROR])
+
+    @mock.patch('attributecode.httpclient.get')
+    def test_fetch_dejacode_licenses_with_invalid_api_url(self, http_get):
+        http_get.side_effect = HTTPError('https://djc.example.com/', 404, 'Not Found', {}, None)
+        results = model.fetch_dejacode_licenses('https://djc.example.com/', 'key', ['mit'])
+        assert results['mit'] == ({}, False, [api.INVALID_URL_ERROR])
+
+    @mock.patch.object(model, 'DEJACODE_BATCH_SIZE', 1)
+    @mock.patch('attributecode.httpclient.get')
+    def test_pre_process_and_fetch_license_dict_with_server_error_skips_the_batch_only(self, http_get):
+
+        def fake_get(url, headers=None, timeout=None):
+            if 'key=mit' in url:
+                raise HTTPError(url, 502, 'Bad Gateway', {}, None)
+            page = {'count': 1, 'next': None, 'results': [{'key': 'isc', 'full_text': 'isc text'}]}
+            return io.BytesIO(json.dumps(page).encode('utf-8'))
 
+        http_get.side_effect = fake_get
+        about = model.About()
+        about.license_expression.value = 'mit and isc'
+        result, errors = model.pre_process_and_fetch_license_dict(
+            [about], ['https://djc.example.com/', 'key'], False, workers=1)
+        assert list(result) == ['isc']
+        assert len(errors) == 1
+        assert 'HTTP Error 502: Bad Gateway' in errors[0].message
+        assert 'mit' in errors[0].message
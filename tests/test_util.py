@@ -19,9 +19,18 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 from collections import OrderedDict
+import csv
+import datetime
+import io
+import json
+import os
+import pickle
 import string
+import types
 import unittest
 
+import mock
+import openpyxl
 import saneyaml
 
 from testing_utils import extract_test_loc
@@ -32,6 +41,8 @@ from testing_utils import on_windows
 
 from attributecode import CRITICAL
 from attributecode import ERROR
+from attributecode import INFO
+from attributecode import WARNING
 from attributecode import Error
 from attributecode import model
 from attributecode import util
@@ -98,6 +109,42 @@ class TestCsv(unittest.TestCase):
         result = util.load_csv(test_file)
         assert expected == result
 
+    def test_iter_csv_yields_rows_lazily(self):
+        test_file = get_test_loc('test_util/csv/about.csv')
+        result = util.iter_csv(test_file)
+        assert isinstance(result, types.GeneratorType)
+        assert list(result) == util.load_csv(test_file)
+
+    def test_iter_csv_inventory_has_parity_with_csv_DictReader(self):
+        location = os.path.join(get_temp_dir(), 'inventory.csv')
+        with open(location, 'w') as inventory:
+            inventory.write('About_Resource,Name,version\n')
+            inventory.write('/a,a,1.0\n')
+            inventory.write('\n')
+            inventory.write('/b,b\n')
+            inventory.write('/c,c,3.0,extra1,extra2\n')
+            inventory.write('/d,"d\nd",\n')
+
+        with open(location) as inventory:
+            expected = [OrderedDict((key.lower() if key else key, value) for key, value in row.items())
+                        for row in csv.DictReader(inventory)]
+        errors, rows = util.iter_csv_inventory(location)
+        assert [] == errors
+        assert expected == list(rows)
+
+    def test_iter_csv_inventory_reports_duplicated_columns(self):
+        location = get_test_loc('test_util/dup_keys.csv')
+        errors, rows = util.iter_csv_inventory(location)
+        assert util.check_duplicated_columns(location) == errors
+        assert [] == rows
+
+    def test_iter_csv_inventory_with_configuration(self):
+        location = get_test_loc('test_util/load/simple_sample.csv')
+        configuration = get_test_loc('test_util/load/key.config')
+        errors, rows = util.iter_csv_inventory(location, configuration)
+        assert [] == errors
+        assert util.load_csv(location, configuration) == list(rows)
+
     def test_load_csv_utf_8(self):
         test_file = get_test_loc('test_util/csv/test_utf8.csv')
         expected = [OrderedDict([(u'about_resource', u'/myFile'), (u'name', u'\u540d')])]
@@ -151,6 +198,27 @@ class TestJson(unittest.TestCase):
         result = util.load_scancode_json(test_file)
         assert expected == result
 
+    def test_iter_json_array_items_with_small_chunks(self):
+        test_file = get_test_loc('test_util/json/scancode_info.json')
+        with open(test_file) as inp:
+            expected = json.load(inp)['files']
+        with open(test_file) as inp:
+            result = list(util.iter_json_array_items(inp, 'files', chunk_size=7))
+        assert expected == result
+
+        content = '{"headers": [{"a": 1}], "count": 12345, "files": [{"path": "a"}, {"path": "b"}], "z": 1}'
+        result = list(util.iter_json_array_items(io.StringIO(content), 'files', chunk_size=1))
+        assert [{'path': 'a'}, {'path': 'b'}] == result
+        assert [] == list(util.iter_json_array_items(io.StringIO('{"files": []}'), 'files'))
+        assert [] == list(util.iter_json_array_items(io.StringIO('{}'), 'files'))
+
+    def test_iter_json_array_items_raises_on_invalid_json(self):
+        try:
+            list(util.iter_json_array_items(io.StringIO('{"files": [{"path": "a"}'), 'files', chunk_size=3))
+            self.fail('ValueError not raised')
+        except ValueError:
+            pass
+
 class TestMiscUtils(unittest.TestCase):
 
     def test_unique_does_deduplicate_and_keep_ordering(self):
@@ -159,6 +227,76 @@ class TestMiscUtils(unittest.TestCase):
         results = util.unique(items)
         assert expected == results
 
+    def test_unique_deduplicates_unhashable_items(self):
+        items = [{'a': 1}, 'b', {'a': 1}, 'b', ['c']]
+        expected = [{'a': 1}, 'b', ['c']]
+        assert expected == util.unique(items)
+
+    def test_unique_deduplicates_errors(self):
+        items = [Error(ERROR, 'a'), Error(CRITICAL, 'a'), Error(ERROR, 'a'), Error(ERROR, u'a')]
+        expected = [Error(ERROR, 'a'), Error(CRITICAL, 'a')]
+        assert expected == util.unique(items)
+
+    def test_Error_is_hashable(self):
+        assert hash(Error(ERROR, 'a')) == hash(Error(ERROR, 'a'))
+        assert Error(ERROR, 'a') == Error(ERROR, 'a')
+        assert Error(ERROR, 'a') != Error(CRITICAL, 'a')
+        assert Error(ERROR, 'a') != Error(ERROR, 'b')
+        assert len({Error(ERROR, 'a'), Error(ERROR, 'a'), Error(ERROR, 'b')}) == 2
+
+    def test_Error_kind_is_not_compared_and_is_pickled(self):
+        error = Error(ERROR, 'a', kind='some-kind')
+        assert 'some-kind' == error.kind
+        assert None == Error(ERROR, 'a').kind
+        assert Error(ERROR, 'a') == error
+        assert hash(Error(ERROR, 'a')) == hash(error)
+        unpickled = pickle.loads(pickle.dumps(error))
+        assert error == unpickled
+        assert 'some-kind' == unpickled.kind
+
+    def test_ErrorAggregator_keeps_counts_and_samples(self):
+        errors = [Error(ERROR, "Invalid 'license': lic-%d" % i, kind='invalid-license-key') for i in range(8)]
+        errors.append(Error(ERROR, "Invalid 'license': lic-1", kind='invalid-license-key'))
+        errors.append(Error(CRITICAL, 'Some other problem.'))
+        aggregator = util.ErrorAggregator(errors, samples_size=3)
+        assert 9 == len(aggregator)
+        assert 1 == aggregator.count(CRITICAL)
+        expected = [
+            Error(ERROR, "Invalid 'license': lic-0"),
+            Error(ERROR, "Invalid 'license': lic-1"),
+            Error(ERROR, "Invalid 'license': lic-2"),
+            Error(ERROR, '5 more errors of the kind "invalid-license-key" are not reported. '
+                         'Use --verbose to report all the errors.'),
+            Error(CRITICAL, 'Some other problem.'),
+        ]
+        assert expected == aggregator.get_errors()
+        assert [Error(CRITICAL, 'Some other problem.')] == aggregator.get_errors(CRITICAL)
+        assert errors[:8] + errors[9:] == aggregator.errors
+
+    def test_ErrorAggregator_reports_few_errors_unchanged(self):
+        errors = [Error(WARNING, 'Field Name is a duplicate.'), Error(INFO, "Field name: 'a b' is ignored.")]
+        assert errors == util.ErrorAggregator(errors).get_errors()
+
+    def test_ErrorAggregator_does_not_group_errors_without_kind(self):
+        errors = [Error(ERROR, "Invalid 'license': lic-%d" % i) for i in range(8)]
+        assert errors == util.ErrorAggregator(errors, samples_size=3).get_errors()
+
+    def test_ErrorAggregator_groups_field_name_errors_by_kind(self):
+        errors = [model.validate_field_name('invalid name %d' % i) for i in range(3)]
+        mapping = util.FieldMapping(dict(('missing_%d' % i, 'name_%d' % i) for i in range(3)))
+        mapping.validate(['name'])
+        errors.extend(mapping.errors)
+        result = util.ErrorAggregator(errors, samples_size=1).get_errors()
+        expected = [
+            Error(INFO, "Field name: 'invalid name 0' is ignored as it contains illegal name characters."),
+            Error(INFO, '2 more errors of the kind "illegal-field-name" are not reported. '
+                        'Use --verbose to report all the errors.'),
+            mapping.errors[0],
+            Error(INFO, '2 more errors of the kind "unmapped-field-name" are not reported. '
+                        'Use --verbose to report all the errors.'),
+        ]
+        assert expected == result
+
     def test_check_duplicated_columns(self):
         test_file = get_test_loc('test_util/dup_keys.csv')
         expected = [Error(ERROR, 'Duplicated column name(s): copyright with copyright\nPlease correct the input and re-run.')]
@@ -198,6 +336,71 @@ class TestMiscUtils(unittest.TestCase):
         assert abouts[0].license_expression.value == 'bsd-new and mit'
         assert abouts[1].license_expression.value == 'mit'
 
+    def test_load_inventory_csv_with_newline_in_file_field(self):
+        location = get_test_loc('test_util/load/newline_in_file_field.csv')
+        errors, abouts = util.load_inventory(location)
+        expected = [
+            Error(CRITICAL,
+                  "New line character detected in 'license_file' for '/project/a' which is not supported."
+                  "\nPlease use ',' to declare multiple files.")]
+        assert errors == expected
+        assert abouts == []
+
+    def test_load_inventory_with_processes_has_parity_with_serial_load(self):
+        for name, scancode in (('report_sample.xlsx', False),
+                               ('simple_sample.csv', False),
+                               ('newline_in_file_field.csv', False),
+                               ('clean-text-0.3.0-lceupi.json', True)):
+            location = get_test_loc('test_util/load/' + name)
+            expected_errors, expected_abouts = util.load_inventory(location, scancode=scancode)
+            errors, abouts = util.load_inventory(location, scancode=scancode, processes=2)
+            assert expected_errors == errors
+            expected = [util.convert_object_to_dict(a) for a in expected_abouts]
+            assert expected == [util.convert_object_to_dict(a) for a in abouts]
+
+    def test_iter_abouts_reports_field_name_errors_once(self):
+        inventory = [
+            OrderedDict([('name', 'a'), ('Home Page', 'https://a.com')]),
+            OrderedDict([('name', 'b'), ('Home Page', 'https://b.com')]),
+        ]
+        result = list(util.iter_abouts(inventory))
+        expected = [Error(INFO, "Field name: 'home page' is ignored as it contains illegal name characters.")]
+        assert expected == result[0][1]
+        assert [] == result[1][1]
+        assert ['a', 'b'] == [about.name.value for about, _ in result]
+
+    def test_iter_abouts_in_processes_keeps_inventory_order(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        inventory = util.load_scancode_json(location)
+        expected = list(util.iter_abouts(inventory, scancode=True))
+        result = list(util.iter_abouts_in_processes(
+            inventory, scancode=True, processes=2, chunk_size=1))
+        assert [e for _, e in expected] == [e for _, e in result]
+        assert ([util.convert_object_to_dict(a) for a, _ in expected]
+                == [util.convert_object_to_dict(a) for a, _ in result])
+
+    def test_load_inventory_stops_when_error_budget_is_exceeded(self):
+        location = os.path.join(get_temp_dir(), 'inventory.csv')
+        with open(location, 'w') as inventory:
+            inventory.write('about_resource,name,license_file\n')
+            for i in range(10):
+                inventory.write('/project/%d,p%d,"a.LICENSE\nb.LICENSE"\n' % (i, i))
+
+        budget = util.ErrorBudget(max_errors=1)
+        errors, abouts = util.load_inventory(location, budget=budget)
+        assert budget.is_exceeded
+        assert len(errors) == 2
+        assert abouts == []
+
+        errors, abouts = util.load_inventory(location, budget=util.ErrorBudget())
+        assert len(errors) == 10
+
+    def test_ErrorBudget_counts_unique_errors_and_warnings(self):
+        budget = util.ErrorBudget(max_errors=1)
+        assert not budget.extend([Error(WARNING, 'a'), Error(WARNING, 'a'), Error(INFO, 'b')])
+        assert budget.extend([Error(ERROR, 'c')])
+        assert not util.ErrorBudget().extend([Error(ERROR, 'c')] * 10)
+
     def test_load_inventory_simple_xlsx(self):
         location = get_test_loc('test_util/load/simple_sample.xlsx')
         base_dir = get_temp_dir()
@@ -234,6 +437,52 @@ class TestMiscUtils(unittest.TestCase):
         # We will only check the first element in the inventory list 
         assert inventory[0] == expected
 
+    def test_load_scancode_json_with_keep_fields(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        configuration = get_test_loc('test_util/load/key.config')
+        inventory = util.load_scancode_json(location, configuration, keep_fields=['resource', 'licenses'])
+        expected = {'resource': 'clean-text-0.3.0', 'licenses': []}
+        assert inventory[0] == expected
+
+    def test_load_inventory_scancode_with_keep_fields_loads_the_required_fields(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        errors, abouts = util.load_inventory(location, scancode=True, keep_fields=['copyrights'])
+        about = abouts[0]
+        assert about.name.value == 'clean-text-0.3.0'
+        assert 'copyrights' in about.custom_fields
+        assert 'licenses' in about.custom_fields
+        assert 'emails' not in about.custom_fields
+
+        errors, abouts = util.load_inventory(location, scancode=True)
+        assert 'emails' in abouts[0].custom_fields
+
+    def test_load_scancode_json_with_min_license_score(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        inventory = util.load_scancode_json(location, min_license_score=95)
+        assert len(inventory) == 5
+        for item in inventory:
+            assert item['licenses']
+            assert all(lic['score'] >= 95 for lic in item['licenses'])
+        assert [99.0, 100.0] == sorted(lic['score'] for lic in inventory[1]['licenses'])
+
+    def test_filter_license_detections(self):
+        item = {'path': 'a', 'licenses': [{'key': 'mit', 'score': 100.0}, {'key': 'gpl', 'score': 20.0}]}
+        assert util.filter_license_detections(item, 50) == {'path': 'a', 'licenses': [{'key': 'mit', 'score': 100.0}]}
+        assert util.filter_license_detections(item, 101) is None
+        assert util.filter_license_detections({'path': 'b', 'licenses': []}, 0) is None
+
+    def test_load_inventory_scancode_aggregated_by_package(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        errors, abouts = util.load_inventory(
+            location, scancode=True, min_license_score=100, aggregate_by='package', keep_fields=[])
+        assert errors == []
+        assert len(abouts) == 1
+        about = abouts[0]
+        assert ('clean-text', '0.3.0') == (about.name.value, about.version.value)
+        assert 'pkg:pypi/clean-text@0.3.0' == about.package_url.value
+        assert ['apache-2.0', 'gpl-1.0-plus'] == sorted(lic['key'] for lic in about.licenses.value)
+        assert 'packages' not in about.custom_fields
+
     def test_load_scancode_json_with_conf(self):
         location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
         base_dir = get_temp_dir()
@@ -283,6 +532,102 @@ class TestMiscUtils(unittest.TestCase):
         assert inventory == expected
         assert dup_cols_err == []
 
+    def test_iter_excel_yields_rows_lazily(self):
+        location = get_test_loc('test_util/load/simple_sample.xlsx')
+        dup_cols_err, rows = util.iter_excel(location)
+        assert dup_cols_err == []
+        assert isinstance(rows, types.GeneratorType)
+        assert list(rows) == util.load_excel(location)[1]
+
+    def test_load_excel_native_engine_has_parity_with_openpyxl(self):
+        for name in ('report_sample.xlsx', 'simple_sample.xlsx', 'dup_keys.xlsx'):
+            location = get_test_loc('test_util/load/' + name)
+            expected = util.load_excel(location, engine='openpyxl')
+            result = util.load_excel(location, engine='native')
+            assert expected == result
+
+    def test_load_excel_native_engine_has_parity_with_openpyxl_for_values(self):
+        location = os.path.join(get_temp_dir(), 'values.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['about_resource', 'name', 'version', 'date', 'is_modified'])
+        sheet.append(['/a', 'a & <b>', 1, datetime.datetime(2021, 6, 23, 10, 30), True])
+        sheet.append([])
+        sheet['A4'] = '/c'
+        sheet['C4'] = 2.5
+        sheet['E4'] = False
+        workbook.save(location)
+
+        expected = util.load_excel(location, engine='openpyxl')
+        result = util.load_excel(location, engine='native')
+        assert expected == result
+        assert result[1][0]['date'] == datetime.datetime(2021, 6, 23, 10, 30)
+
+    def test_load_excel_keeps_the_formula_text_of_formula_cells(self):
+        location = os.path.join(get_temp_dir(), 'formulas.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['name', 'version', 'notes'])
+        sheet.append(['a', 1, '=B2+1'])
+        workbook.save(location)
+
+        for engine in util.EXCEL_ENGINES:
+            errors, inventory = util.load_excel(location, engine=engine)
+            assert errors == []
+            assert inventory[0]['notes'] == '=B2+1', engine
+
+    def test_load_inventory_with_native_excel_engine(self):
+        location = get_test_loc('test_util/load/report_sample.xlsx')
+        expected_errors, expected_abouts = util.load_inventory(location)
+        errors, abouts = util.load_inventory(location, excel_engine='native')
+        assert expected_errors == errors
+        expected = [util.convert_object_to_dict(a) for a in expected_abouts]
+        assert expected == [util.convert_object_to_dict(a) for a in abouts]
+
+    def test_load_xlsx_with_duplicated_columns(self):
+        location = get_test_loc('test_util/load/dup_keys.xlsx')
+        dup_cols_err, inventory = util.load_excel(location)
+        expected = [Error(CRITICAL, 'Duplicated column name, name, detected.')]
+        assert dup_cols_err == expected
+        assert inventory == []
+
+        errors, abouts = util.load_inventory(location)
+        assert errors == expected
+        assert abouts == []
+
+    def test_FieldMapping_rename_in_place(self):
+        mapping = util.FieldMapping({'path': 'resource', 'Component': 'name'})
+        item = {'path': 'a.c', 'size': 12}
+        assert mapping.rename_in_place(item) is item
+        assert {'resource': 'a.c', 'size': 12} == item
+
+    def test_FieldMapping_rename_in_place_with_swapped_names(self):
+        mapping = util.FieldMapping({'name': 'component', 'component': 'name'})
+        item = mapping.rename_in_place({'name': 'n1', 'component': 'c1'})
+        assert item == {'component': 'n1', 'name': 'c1'}
+
+    def test_FieldMapping_rename_in_place_with_chained_names(self):
+        mapping = util.FieldMapping({'a': 'b', 'b': 'c'})
+        item = mapping.rename_in_place(OrderedDict([('a', 1), ('b', 2), ('d', 3)]))
+        assert item == OrderedDict([('d', 3), ('b', 1), ('c', 2)])
+
+    def test_FieldMapping_validate_reports_names_not_in_the_input_once(self):
+        mapping = util.FieldMapping({'path': 'resource', 'Component': 'name'})
+        assert ['resource', 'size'] == mapping.rename_columns(['path', 'size'])
+        mapping.validate(['other'])
+        expected = [Error(INFO, "Field name: 'Component' of the configuration is not found in the input.")]
+        assert expected == mapping.errors
+
+    def test_load_inventory_loads_the_configuration_once(self):
+        location = get_test_loc('test_util/load/clean-text-0.3.0-lceupi.json')
+        configuration = get_test_loc('test_util/load/key.config')
+        from_file = util.FieldMapping.from_file
+        with mock.patch('attributecode.util.FieldMapping.from_file', side_effect=from_file) as mock_from_file:
+            errors, abouts = util.load_inventory(location, configuration, scancode=True)
+        assert 1 == mock_from_file.call_count
+        assert abouts[0].custom_fields['resource'].value == 'clean-text-0.3.0'
+        assert Error(INFO, "Field name: 'Component' of the configuration is not found in the input.") in errors
+
     def test_convert_object_to_dict(self):
         location = get_test_loc('test_util/load/simple_sample.csv')
         base_dir = get_temp_dir()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import os
+import unittest
+import zipfile
+
+import mock
+import openpyxl
+
+from testing_utils import get_temp_dir
+from testing_utils import get_test_loc
+
+from attributecode import xlsx
+
+
+class XlsxTest(unittest.TestCase):
+
+    def test_iter_rows(self):
+        location = get_test_loc('test_util/load/simple_sample.xlsx')
+        rows = list(xlsx.iter_rows(location))
+        assert rows[0][:2] == ('name', 'version')
+        assert len(rows) == 3
+
+    def test_get_column_index(self):
+        assert xlsx.get_column_index('A1') == 0
+        assert xlsx.get_column_index('Z10') == 25
+        assert xlsx.get_column_index('AB3') == 27
+
+    def test_from_excel(self):
+        assert xlsx.from_excel(44370) == datetime.datetime(2021, 6, 23)
+        assert xlsx.from_excel(44370.4375) == datetime.datetime(2021, 6, 23, 10, 30)
+        assert xlsx.from_excel(0.5) == datetime.time(12, 0)
+
+    def test_translate_formula(self):
+        assert xlsx.translate_formula('=B2+1', 'C3', 'D5') == '=C4+1'
+        assert xlsx.translate_formula('=SUM($A1:B$2)', 'B2', 'C4') == '=SUM($A3:C$2)'
+        assert xlsx.translate_formula('=LOG10(A1)&"A1"', 'A1', 'B2') == '=LOG10(B2)&"A1"'
+        assert xlsx.translate_formula('=A:A+SUM(1:2)', 'A1', 'B3') == '=B:B+SUM(3:4)'
+        assert xlsx.translate_formula('=A1', 'B2', 'A1') == '=#REF!'
+
+    def test_iter_rows_returns_the_text_of_shared_formulas(self):
+        location = os.path.join(get_temp_dir(), 'formulas.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['version', 'notes'])
+        sheet.append([1, '=A2+1'])
+        sheet.append([2, '=A3+1'])
+        workbook.save(location)
+
+        # rewrite the formulas as a shared formula as Excel does
+        shared_location = os.path.join(get_temp_dir(), 'shared_formulas.xlsx')
+        with zipfile.ZipFile(location) as source, zipfile.ZipFile(shared_location, 'w') as target:
+            for info in source.infolist():
+                content = source.read(info.filename)
+                if info.filename == 'xl/worksheets/sheet1.xml':
+                    content = content.replace(
+                        b'<f>A2+1</f><v /></c>', b'<f t="shared" ref="B2:B3" si="0">A2+1</f><v>2</v></c>')
+                    content = content.replace(b'<f>A3+1</f><v /></c>', b'<f t="shared" si="0"/><v>3</v></c>')
+                    assert b'<f t="shared" si="0"/>' in content
+                target.writestr(info, content)
+
+        expected = list(openpyxl.load_workbook(shared_location, read_only=True).active.iter_rows(values_only=True))
+        rows = list(xlsx.iter_rows(shared_location))
+        assert rows == expected
+        assert rows[1:] == [(1, '=A2+1'), (2, '=A3+1')]
+
+    def test_iter_rows_removes_the_processed_rows_from_the_tree(self):
+        location = os.path.join(get_temp_dir(), 'rows.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        for i in range(100):
+            sheet.append(['name%d' % i, i])
+        workbook.save(location)
+
+        sheet_data = []
+        iterparse = xlsx.iterparse
+
+        def tracking_iterparse(source, events=None):
+            for event, element in iterparse(source, events=events):
+                if event == 'start' and xlsx.get_local_name(element.tag) == 'sheetData':
+                    sheet_data.append(element)
+                yield event, element
+
+        rows = 0
+        with mock.patch('attributecode.xlsx.iterparse', tracking_iterparse):
+            for _row in xlsx.iter_rows(location):
+                rows += 1
+                # the processed rows are not kept in the sheet data: only
+                # the rows parsed ahead in the current read buffer are
+                assert len(sheet_data[0]) <= 100 - rows + 1
+        assert len(sheet_data[0]) == 0
+        assert rows == 100